@@ -1,23 +1,119 @@
 #!/usr/bin/env python3
 """
 Aggregate results from parallel GitHub Actions runs and create plots
+
+Result files are read in parallel with explicit dtypes; files that do not
+match the results schema (e.g. per-run timeseries) are reported and
+skipped. Write the combined table as Parquet by giving --output a
+.parquet suffix (requires pyarrow).
 """
 
 import argparse
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 import sys
 
+# Columns every results file must have
+REQUIRED_COLUMNS = ['param_name', 'param_value', 'infected', 'long_covid_cases']
+
+# Explicit dtypes of the known columns
+RESULT_DTYPES = {
+    'param_name': 'string',
+    'param_value': 'float64',
+    'run': 'int64',
+    'agents': 'int64',
+    'runtime_days': 'int64',
+    'infected': 'int64',
+    'reinfected': 'int64',
+    'long_covid_cases': 'int64',
+    'min_productivity': 'float64',
+    'peak_infected': 'int64',
+    'day_of_peak': 'int64',
+    'peak_incidence': 'int64',
+    'day_of_peak_incidence': 'int64',
+    'symptomatic_days': 'int64',
+    'peak_long_covid': 'int64',
+}
+
+def read_result_file(path):
+    """
+    Read one results CSV; returns (path, DataFrame or None, error message).
+    """
+    try:
+        # Check the header first, so other CSVs (e.g. timeseries) are never parsed
+        columns = pd.read_csv(path, nrows=0).columns
+        missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing:
+            return path, None, f"not a results file (missing {', '.join(missing)})"
+        df = pd.read_csv(path, dtype={col: RESULT_DTYPES[col] for col in columns if col in RESULT_DTYPES})
+    except Exception as e:
+        return path, None, str(e)
+    if df['param_name'].isna().any() or df['param_value'].isna().any():
+        return path, None, "missing param_name/param_value values"
+    return path, df, None
+
+def load_results(csv_files, workers=None, executor='thread'):
+    """
+    Read ``csv_files`` with a thread (or process) pool.
+
+    Returns (combined DataFrame or None, {path: error}) with files in
+    sorted path order, so the output does not depend on completion order.
+    """
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    chunksize = max(1, len(csv_files) // (workers * 4)) if executor == 'process' else 1
+    
+    dfs, errors = [], {}
+    with pool(max_workers=workers) as ex:
+        for path, df, error in ex.map(read_result_file, sorted(csv_files), chunksize=chunksize):
+            if error is not None:
+                errors[path] = error
+            else:
+                dfs.append(df)
+    
+    if not dfs:
+        return None, errors
+    combined_df = pd.concat(dfs, ignore_index=True)
+    combined_df['param_name'] = combined_df['param_name'].astype('category')
+    return combined_df, errors
+
+def save_results(df, output_file):
+    """Write CSV, or Parquet when ``output_file`` ends in .parquet"""
+    if str(output_file).endswith('.parquet'):
+        try:
+            df.to_parquet(output_file, index=False)
+        except ImportError:
+            print("ERROR: Parquet output requires pyarrow (pip install pyarrow)")
+            sys.exit(1)
+    else:
+        df.to_csv(output_file, index=False)
+
+def plot_path(output_file, param_name, n_params):
+    """One plot per parameter: add the parameter to the file name if there are several"""
+    if n_params == 1:
+        return output_file
+    path = Path(output_file)
+    return str(path.with_name(f"{path.stem}_{param_name}{path.suffix}"))
+
+
 def main():
     parser = argparse.ArgumentParser(description='Aggregate parallel simulation results')
     parser.add_argument('--input_dir', type=str, required=True,
                         help='Directory containing result artifacts')
     parser.add_argument('--output', type=str, required=True,
-                        help='Output combined CSV file')
+                        help='Output combined CSV (or .parquet) file')
     parser.add_argument('--plot', type=str, required=True,
-                        help='Output plot file')
+                        help='Output plot file (one per parameter if several were swept)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Parallel readers (default: CPU count)')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help='Reader pool type')
+    parser.add_argument('--strict', action='store_true',
+                        help='Fail if any file does not match the results schema')
     
     args = parser.parse_args()
     
@@ -36,44 +132,41 @@ def main():
         sys.exit(1)
     
     # Load and combine all results
-    dfs = []
-    for csv_file in csv_files:
-        try:
-            df = pd.read_csv(csv_file)
-            dfs.append(df)
-            print(f"  ✓ Loaded {csv_file.name}: {len(df)} rows")
-        except Exception as e:
-            print(f"  ✗ Error loading {csv_file.name}: {e}")
+    combined_df, errors = load_results(csv_files, workers=args.workers, executor=args.executor)
+    print(f"  ✓ Loaded {len(csv_files) - len(errors)} files")
+    for path, error in errors.items():
+        print(f"  ✗ Skipped {path}: {error}")
     
-    if not dfs:
+    if combined_df is None:
         print("ERROR: No valid data loaded!")
         sys.exit(1)
-    
-    # Combine all dataframes
-    combined_df = pd.concat(dfs, ignore_index=True)
+    if errors and args.strict:
+        print(f"ERROR: {len(errors)} files failed validation")
+        sys.exit(1)
     
     # Save combined results
-    combined_df.to_csv(args.output, index=False)
+    save_results(combined_df, args.output)
     print(f"\n✓ Saved combined results to {args.output}")
     print(f"  Total rows: {len(combined_df)}")
     print(f"  Columns: {', '.join(combined_df.columns)}")
     
     # Print summary by parameter value
-    if 'param_name' in combined_df.columns and 'param_value' in combined_df.columns:
-        param_name = combined_df['param_name'].iloc[0]
+    groups = combined_df.groupby('param_name', observed=True)
+    for param_name, group in groups:
         print(f"\n  Parameter: {param_name}")
-        for value in sorted(combined_df['param_value'].unique()):
-            count = len(combined_df[combined_df['param_value'] == value])
+        for value, count in group['param_value'].value_counts().sort_index().items():
             print(f"    Value {value}: {count} runs")
     
     # Create visualization
     print(f"\n📊 Creating visualization...")
-    create_plot(combined_df, args.plot)
-    print(f"✓ Saved plot to {args.plot}")
+    for param_name, group in groups:
+        output_file = plot_path(args.plot, param_name, groups.ngroups)
+        create_plot(group, output_file)
+        print(f"✓ Saved plot to {output_file}")
     print(f"{'='*70}\n")
 
 def create_plot(df, output_file):
-    """Create comprehensive visualization of results"""
+    """Create comprehensive visualization of results (one swept parameter)"""
     
     if 'param_name' not in df.columns or 'param_value' not in df.columns:
         print("Warning: Missing param_name or param_value columns, skipping plot")
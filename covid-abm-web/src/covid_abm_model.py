@@ -7,14 +7,15 @@ MODIFIED: Implements per-run checkpointing for robust data saving.
 import jax
 import jax.numpy as jnp
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 from jax import random
 import time
 import gc
 
-print(f"JAX devices: {jax.devices()}")
-print(f"JAX backend: {jax.default_backend()}")
+
+def print_backend_info():
+    """Print the JAX devices and backend (initialises the backend)"""
+    print(f"JAX devices: {jax.devices()}")
+    print(f"JAX backend: {jax.default_backend()}")
 
 
 class FixedGPUABM:
@@ -734,6 +735,7 @@ LABELS = {
 
 def run_gpu_sweep(n_runs=10, N=100000, output_file="gpu_sweep_results.csv"):
     """Run parameter sweep on GPU with per-run checkpointing"""
+    import pandas as pd
     
     # Define columns for CSV header initialization
     df_cols = ['runtime_days', 'infected', 'reinfected', 'long_covid_cases',
@@ -828,6 +830,8 @@ def run_gpu_sweep(n_runs=10, N=100000, output_file="gpu_sweep_results.csv"):
 
 def make_grid(df, out_png="gpu_results.png"):
     """Generate parameter sweep grid plot"""
+    import matplotlib.pyplot as plt
+    
     cols = list(ORDER.keys())
     rows = METRICS
     nrows = len(rows)
@@ -917,6 +921,8 @@ def full_sweep_and_plot(n_runs=10, N=100000):
 if __name__ == "__main__":
     import sys
     
+    print_backend_info()
+    
     if len(sys.argv) > 1 and sys.argv[1] == "demo":
         # Quick demo
         quick_demo()
@@ -931,6 +937,7 @@ if __name__ == "__main__":
         # Just plot existing results
         csv_file = sys.argv[2] if len(sys.argv) > 2 else "gpu_sweep_results.csv"
         print(f"\n📊 Loading results from {csv_file}...")
+        import pandas as pd
         df = pd.read_csv(csv_file)
         make_grid(df, out_png="gpu_parameter_sweep.png")
     
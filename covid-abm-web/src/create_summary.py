@@ -4,14 +4,75 @@ Create markdown summary of parameter sweep results
 """
 
 import argparse
+import json
 import pandas as pd
 import numpy as np
 import sys
 
+# (column, table heading, mean±std format, unit)
+TABLE_METRICS = [
+    ('infected', 'Infected', ',.0f', ''),
+    ('reinfected', 'Reinfected', ',.0f', ''),
+    ('long_covid_cases', 'Long COVID', ',.0f', ''),
+    ('min_productivity', 'Min Productivity', '.1f', '%'),
+]
+SUMMARY_METRICS = [m for m, _, _, _ in TABLE_METRICS] + ['runtime_days']
+GROUP_COLUMNS = ['param_name', 'param_value']
+
+def load_aggregates(input_file):
+    """
+    Per (param_name, param_value): ``n`` and ``{metric}_mean`` /
+    ``{metric}_std`` for every SUMMARY_METRICS column present.
+
+    Accepts combined results as CSV or Parquet (only the needed columns are
+    read, then aggregated in one groupby) or the online statistics written
+    alongside a sweep (``<output>_stats.json``), which need no scan at all.
+    """
+    if input_file.endswith('.json'):
+        return _aggregates_from_stats(input_file)
+    
+    needed = set(GROUP_COLUMNS + SUMMARY_METRICS)
+    if input_file.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        names = pq.ParquetFile(input_file).schema_arrow.names
+        df = pd.read_parquet(input_file, columns=[c for c in names if c in needed])
+    else:
+        df = pd.read_csv(input_file, usecols=lambda c: c in needed)
+    
+    missing_cols = [col for col in GROUP_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+    
+    metrics = [m for m in SUMMARY_METRICS if m in df.columns]
+    grouped = df.groupby(GROUP_COLUMNS, observed=True, sort=True)
+    agg = grouped[metrics].agg(['mean', 'std'])
+    agg.columns = [f"{metric}_{stat}" for metric, stat in agg.columns]
+    agg.insert(0, 'n', grouped.size())
+    return agg.reset_index()
+
+def _aggregates_from_stats(stats_file):
+    """load_aggregates() for an online-statistics file (running mean and M2)"""
+    with open(stats_file) as f:
+        points = json.load(f)['points']
+    
+    rows = []
+    for point in points:
+        n = point['n']
+        row = {'param_name': point['param_name'], 'param_value': point['param_value'], 'n': n}
+        for metric in SUMMARY_METRICS:
+            if metric in point['metrics']:
+                m = point['metrics'][metric]
+                row[f"{metric}_mean"] = m['mean']
+                row[f"{metric}_std"] = np.sqrt(m['m2'] / (n - 1)) if n > 1 else np.nan
+        rows.append(row)
+    if not rows:
+        raise ValueError("No design points in statistics file")
+    return pd.DataFrame(rows).sort_values(GROUP_COLUMNS, ignore_index=True)
+
 def main():
     parser = argparse.ArgumentParser(description='Create result summary')
     parser.add_argument('--input', type=str, required=True,
-                        help='Input combined CSV file')
+                        help='Input combined CSV/Parquet file or online statistics (_stats.json)')
     parser.add_argument('--output', type=str, required=True,
                         help='Output markdown file')
     
@@ -21,138 +82,121 @@ def main():
     print(f"CREATING SUMMARY")
     print(f"{'='*70}")
     
-    # Load data
+    # Load per-value aggregates
     try:
-        df = pd.read_csv(args.input)
-        print(f"✓ Loaded {len(df)} rows from {args.input}")
+        agg = load_aggregates(args.input)
+        print(f"✓ Loaded {int(agg['n'].sum())} runs from {args.input}")
     except Exception as e:
         print(f"✗ Error loading data: {e}")
         sys.exit(1)
     
-    # Validate required columns
-    required_cols = ['param_name', 'param_value']
-    missing_cols = [col for col in required_cols if col not in df.columns]
-    if missing_cols:
-        print(f"✗ Missing required columns: {missing_cols}")
-        sys.exit(1)
+    param_names = list(agg['param_name'].unique())
+    total_runs = int(agg['n'].sum())
     
-    param_name = df['param_name'].iloc[0]
-    param_values = sorted(df['param_value'].unique())
+    summary = []
+    summary.append(f"# Parameter Sweep Results\n")
+    if len(param_names) > 1:
+        summary.append(f"**Parameters:** {', '.join(f'`{p}`' for p in param_names)}\n")
+    for param_name in param_names:
+        by_value = agg[agg['param_name'] == param_name].reset_index(drop=True)
+        print(f"  Parameter: {param_name}")
+        print(f"  Values: {list(by_value['param_value'])}")
+        summary.extend(parameter_section(param_name, by_value))
     
-    print(f"  Parameter: {param_name}")
-    print(f"  Values: {param_values}")
+    # Statistical notes
+    summary.append("\n## Statistical Notes\n")
+    summary.append(f"- Results based on {total_runs} total simulation runs")
+    summary.append(f"- Error bars represent standard deviation across replicates")
+    summary.append(f"- Variations reflect stochastic nature of epidemic dynamics")
+    
+    # Write to file
+    summary_text = '\n'.join(summary)
+    try:
+        with open(args.output, 'w') as f:
+            f.write(summary_text)
+        print(f"✓ Summary written to {args.output}")
+        print(f"  Length: {len(summary_text)} characters")
+        print(f"{'='*70}\n")
+    except Exception as e:
+        print(f"✗ Error writing summary: {e}")
+        sys.exit(1)
+
+def parameter_section(param_name, by_value):
+    """Markdown lines for one swept parameter from its per-value aggregates"""
+    param_values = list(by_value['param_value'])
+    n_min, n_max = int(by_value['n'].min()), int(by_value['n'].max())
     
-    # Generate summary
     summary = []
-    summary.append(f"# Parameter Sweep Results\n")
     summary.append(f"## Parameter: `{param_name}`\n")
-    summary.append(f"**Total Runs:** {len(df)}\n")
+    summary.append(f"**Total Runs:** {int(by_value['n'].sum())}\n")
     summary.append(f"**Parameter Values Tested:** {', '.join(map(str, param_values))}\n")
-    summary.append(f"**Runs per Value:** {len(df) // len(param_values)}\n")
+    summary.append(f"**Runs per Value:** {n_min if n_min == n_max else f'{n_min}-{n_max}'}\n")
     
     # Results table
     summary.append("\n## Results by Parameter Value\n")
     summary.append("| Value | Infected (mean±std) | Reinfected (mean±std) | Long COVID (mean±std) | Min Productivity (mean±std) |")
     summary.append("|-------|---------------------|----------------------|------------------------|------------------------------|")
     
-    for value in param_values:
-        subset = df[df['param_value'] == value]
-        
-        # Infected
-        if 'infected' in df.columns:
-            inf_mean = subset['infected'].mean()
-            inf_std = subset['infected'].std()
-            inf_str = f"{inf_mean:,.0f}±{inf_std:,.0f}"
-        else:
-            inf_str = "N/A"
-        
-        # Reinfected
-        if 'reinfected' in df.columns:
-            reinf_mean = subset['reinfected'].mean()
-            reinf_std = subset['reinfected'].std()
-            reinf_str = f"{reinf_mean:,.0f}±{reinf_std:,.0f}"
-        else:
-            reinf_str = "N/A"
-        
-        # Long COVID
-        if 'long_covid_cases' in df.columns:
-            lc_mean = subset['long_covid_cases'].mean()
-            lc_std = subset['long_covid_cases'].std()
-            lc_str = f"{lc_mean:,.0f}±{lc_std:,.0f}"
-        else:
-            lc_str = "N/A"
-        
-        # Productivity
-        if 'min_productivity' in df.columns:
-            prod_mean = subset['min_productivity'].mean()
-            prod_std = subset['min_productivity'].std()
-            prod_str = f"{prod_mean:.1f}±{prod_std:.1f}%"
-        else:
-            prod_str = "N/A"
-        
-        summary.append(
-            f"| {value} | {inf_str} | {reinf_str} | {lc_str} | {prod_str} |"
-        )
+    for _, row in by_value.iterrows():
+        cells = []
+        for metric, _, fmt, unit in TABLE_METRICS:
+            if f"{metric}_mean" in by_value.columns:
+                cells.append(f"{row[f'{metric}_mean']:{fmt}}±{row[f'{metric}_std']:{fmt}}{unit}")
+            else:
+                cells.append("N/A")
+        summary.append(f"| {row['param_value']} | {' | '.join(cells)} |")
     
     # Key findings
     summary.append("\n## Key Findings\n")
     
-    avg_by_value = df.groupby('param_value').agg({
-        col: 'mean' for col in df.columns if col in [
-            'infected', 'reinfected', 'long_covid_cases', 
-            'min_productivity', 'runtime_days'
-        ]
-    }).reset_index()
+    avg_by_value = by_value.set_index('param_value')
     
     # Find optimal values
-    if 'infected' in avg_by_value.columns:
-        min_infected_val = avg_by_value.loc[avg_by_value['infected'].idxmin(), 'param_value']
-        min_infected = avg_by_value['infected'].min()
-        max_infected_val = avg_by_value.loc[avg_by_value['infected'].idxmax(), 'param_value']
-        max_infected = avg_by_value['infected'].max()
+    if 'infected_mean' in avg_by_value.columns:
+        infected = avg_by_value['infected_mean']
+        min_infected_val, min_infected = infected.idxmin(), infected.min()
+        max_infected_val, max_infected = infected.idxmax(), infected.max()
         
         summary.append(f"### Infections")
         summary.append(f"- **Lowest infections:** `{param_name} = {min_infected_val}` ({min_infected:,.0f} cases)")
         summary.append(f"- **Highest infections:** `{param_name} = {max_infected_val}` ({max_infected:,.0f} cases)")
         summary.append(f"- **Range:** {((max_infected - min_infected) / min_infected * 100):.1f}% difference\n")
     
-    if 'long_covid_cases' in avg_by_value.columns:
-        min_lc_val = avg_by_value.loc[avg_by_value['long_covid_cases'].idxmin(), 'param_value']
-        min_lc = avg_by_value['long_covid_cases'].min()
-        max_lc_val = avg_by_value.loc[avg_by_value['long_covid_cases'].idxmax(), 'param_value']
-        max_lc = avg_by_value['long_covid_cases'].max()
+    if 'long_covid_cases_mean' in avg_by_value.columns:
+        lc = avg_by_value['long_covid_cases_mean']
+        min_lc_val, min_lc = lc.idxmin(), lc.min()
+        max_lc_val, max_lc = lc.idxmax(), lc.max()
         
         summary.append(f"### Long COVID")
         summary.append(f"- **Lowest Long COVID:** `{param_name} = {min_lc_val}` ({min_lc:,.0f} cases)")
         summary.append(f"- **Highest Long COVID:** `{param_name} = {max_lc_val}` ({max_lc:,.0f} cases)")
         summary.append(f"- **Range:** {((max_lc - min_lc) / min_lc * 100):.1f}% difference\n")
     
-    if 'min_productivity' in avg_by_value.columns:
-        max_prod_val = avg_by_value.loc[avg_by_value['min_productivity'].idxmax(), 'param_value']
-        max_prod = avg_by_value['min_productivity'].max()
-        min_prod_val = avg_by_value.loc[avg_by_value['min_productivity'].idxmin(), 'param_value']
-        min_prod = avg_by_value['min_productivity'].min()
+    if 'min_productivity_mean' in avg_by_value.columns:
+        prod = avg_by_value['min_productivity_mean']
+        max_prod_val, max_prod = prod.idxmax(), prod.max()
+        min_prod_val, min_prod = prod.idxmin(), prod.min()
         
         summary.append(f"### Productivity")
         summary.append(f"- **Highest productivity:** `{param_name} = {max_prod_val}` ({max_prod:.1f}%)")
         summary.append(f"- **Lowest productivity:** `{param_name} = {min_prod_val}` ({min_prod:.1f}%)")
         summary.append(f"- **Range:** {(max_prod - min_prod):.1f} percentage points\n")
     
-    if 'runtime_days' in avg_by_value.columns:
-        avg_runtime = avg_by_value['runtime_days'].mean()
+    if 'runtime_days_mean' in avg_by_value.columns:
+        avg_runtime = avg_by_value['runtime_days_mean'].mean()
         summary.append(f"### Epidemic Duration")
         summary.append(f"- **Average duration:** {avg_runtime:.0f} days\n")
     
     # Recommendations
     summary.append("\n## Recommendations\n")
     
-    if 'infected' in avg_by_value.columns and 'long_covid_cases' in avg_by_value.columns:
+    if 'infected_mean' in avg_by_value.columns and 'long_covid_cases_mean' in avg_by_value.columns:
         # Find best overall value (minimize infections + long covid)
-        avg_by_value['combined_score'] = (
-            avg_by_value['infected'] / avg_by_value['infected'].max() +
-            avg_by_value['long_covid_cases'] / avg_by_value['long_covid_cases'].max()
+        combined_score = (
+            avg_by_value['infected_mean'] / avg_by_value['infected_mean'].max() +
+            avg_by_value['long_covid_cases_mean'] / avg_by_value['long_covid_cases_mean'].max()
         )
-        best_val = avg_by_value.loc[avg_by_value['combined_score'].idxmin(), 'param_value']
+        best_val = combined_score.idxmin()
         
         summary.append(f"Based on this analysis:\n")
         summary.append(f"- **Optimal setting:** `{param_name} = {best_val}` (minimizes combined infections and Long COVID)\n")
@@ -164,23 +208,7 @@ def main():
         elif param_name == 'covid_spread_chance_pct':
             summary.append(f"- Lower transmission rates (achievable through NPIs) significantly reduce epidemic burden")
     
-    # Statistical notes
-    summary.append("\n## Statistical Notes\n")
-    summary.append(f"- Results based on {len(df)} total simulation runs")
-    summary.append(f"- Error bars represent standard deviation across replicates")
-    summary.append(f"- Variations reflect stochastic nature of epidemic dynamics")
-    
-    # Write to file
-    summary_text = '\n'.join(summary)
-    try:
-        with open(args.output, 'w') as f:
-            f.write(summary_text)
-        print(f"✓ Summary written to {args.output}")
-        print(f"  Length: {len(summary_text)} characters")
-        print(f"{'='*70}\n")
-    except Exception as e:
-        print(f"✗ Error writing summary: {e}")
-        sys.exit(1)
+    return summary
 
 if __name__ == "__main__":
     main()
@@ -2,60 +2,889 @@
 COVID-19 ABM - GPU Accelerated with Long COVID + Parameter Sweep + Plotting
 Complete unified implementation matching NetLogo model
 MODIFIED: Implements per-run checkpointing for robust data saving.
+
+The engine only imports numpy and jax, and importing it has no side effects:
+the JAX backend is initialised on first use (set XLA flags before that), and
+pandas / matplotlib are loaded by the sweep and plotting helpers that need them.
 """
 
 import jax
 import jax.numpy as jnp
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from jax import random
+from jax import lax, random
+from jax.sharding import Mesh, NamedSharding, PartitionSpec
+from functools import partial
+from typing import NamedTuple
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+import math
+import os
 import time
 import gc
 
-print(f"JAX devices: {jax.devices()}")
-print(f"JAX backend: {jax.default_backend()}")
+# Per-replicate state and shared params meet in lax.cond branches, which the
+# shard_map replication check rejects; every replicate is independent anyway.
+try:
+    from jax import shard_map
+    _SHARD_MAP_UNCHECKED = {'check_vma': False}
+except ImportError:  # jax < 0.6
+    from jax.experimental.shard_map import shard_map
+    _SHARD_MAP_UNCHECKED = {'check_rep': False}
+
+
+def print_backend_info():
+    """Print the JAX devices and backend (initialises the backend)"""
+    print(f"JAX devices: {jax.devices()}")
+    print(f"JAX backend: {jax.default_backend()}")
+
+
+# ========== COMPACT AGENT STATE ==========
+# Boolean agent properties are packed into one uint8 ``flags`` word per agent.
+
+INFECTED = np.uint8(1 << 0)
+IMMUNED = np.uint8(1 << 1)
+SYMPTOMATIC = np.uint8(1 << 2)
+SUPER_IMMUNE = np.uint8(1 << 3)
+PERSISTENT_LONG_COVID = np.uint8(1 << 4)
+LC_PENDING = np.uint8(1 << 5)
+VACCINATED = np.uint8(1 << 6)
+PADDING = np.uint8(1 << 7)  # Bucket padding slot, not a real agent
+
+
+def has_flag(flags, bit):
+    """Vectorized bit test: boolean mask of agents with ``bit`` set"""
+    return (flags & bit) != 0
+
+
+def set_flag(flags, bit, mask):
+    """Set ``bit`` where ``mask`` is True and clear it elsewhere"""
+    return jnp.where(mask, flags | bit, flags & ~bit)
+
+
+def raise_flag(flags, bit, mask):
+    """Set ``bit`` where ``mask`` is True, leave other agents untouched"""
+    return jnp.where(mask, flags | bit, flags)
+
+
+def clear_flag(flags, bit, mask):
+    """Clear ``bit`` where ``mask`` is True, leave other agents untouched"""
+    return jnp.where(mask, flags & ~bit, flags)
+
+
+# Per-agent probabilities that depend only on age / LC group are looked up
+# from these tables instead of being stored per agent. They are host (numpy)
+# arrays so importing the module does not initialise a JAX backend.
+_AGE_INDEX = np.arange(128)
+COVID_AGE_PROB_TABLE = np.select([
+    _AGE_INDEX < 10, _AGE_INDEX < 20, _AGE_INDEX < 30, _AGE_INDEX < 40,
+    _AGE_INDEX < 50, _AGE_INDEX < 60, _AGE_INDEX < 70, _AGE_INDEX < 80
+], [
+    2.3, 5.1, 15.5, 16.9, 16.4, 16.4, 11.9, 7.0
+], default=8.5).astype(np.float32)
+US_AGE_PROB_TABLE = np.select([
+    _AGE_INDEX < 5, _AGE_INDEX < 15, _AGE_INDEX < 25, _AGE_INDEX < 35, _AGE_INDEX < 45,
+    _AGE_INDEX < 55, _AGE_INDEX < 65, _AGE_INDEX < 75, _AGE_INDEX < 85
+], [
+    5.7, 12.5, 13.0, 13.7, 13.1, 12.3, 12.9, 10.1, 4.9
+], default=1.8).astype(np.float32)
+
+
+def _age_index(age):
+    """Row of the age-probability tables for each agent"""
+    return jnp.clip(age.astype(jnp.int32), 0, 127)
+
+
+# Indexed by recovery group + 1 (group -1 = no Long COVID)
+LC_WEIBULL_K_TABLE = np.array([0.0, 1.5, 1.2, 0.5], dtype=np.float32)
+LC_WEIBULL_LAMBDA_TABLE = np.array([0.0, 60.0, 450.0, 1200.0], dtype=np.float32)
+
+
+# ========== POPULATION BUCKETS ==========
+# Compiled executables are specialised on array shapes. Padding the agent
+# arrays up to a size bucket lets one executable serve every N in the bucket;
+# padding slots carry the PADDING flag, have no contacts and are never
+# infected or vaccinated.
+
+POPULATION_BUCKETS = ('pow2', '1.25x')
+MIN_BUCKET_SIZE = 1024
+NEIGHBOR_BUCKET_SIZE = 8
+
+
+def bucketed_size(n, scheme='pow2'):
+    """Smallest bucket size >= n (``scheme=None`` keeps the exact size)"""
+    if scheme is None:
+        return n
+    if scheme not in POPULATION_BUCKETS:
+        raise ValueError(f"Unknown bucket scheme {scheme!r}, expected one of {POPULATION_BUCKETS}")
+    
+    size = MIN_BUCKET_SIZE
+    while size < n:
+        if scheme == 'pow2':
+            size *= 2
+        else:
+            size = int(math.ceil(size * 1.25 / 256)) * 256
+    return size
+
+
+# ========== AGENT SHARDING ==========
+# Very large populations are split across devices by contiguous agent ID
+# range. The compiled step is unchanged: with the agent arrays and the contact
+# table sharded, XLA partitions it and exchanges the per-contact lookups of
+# remote agents (and the scatter of new infections onto them) with collectives
+# each day. Random draws use partitionable threefry (the default since jax 0.5),
+# so the sharded run is the same simulation as the single-device one.
+
+AGENT_AXIS = 'agents'
+
+
+def agent_sharding(devices):
+    """Sharding that splits the agent axis across ``devices``"""
+    return NamedSharding(Mesh(np.array(devices), (AGENT_AXIS,)), PartitionSpec(AGENT_AXIS))
+
+
+# ========== COMPILED DAILY STEP ==========
+# The daily update is a pure function of an ``AgentState`` pytree so it can be
+# jitted once per population shape. The state buffers are donated to the
+# compiled run function, so each day updates agents in place instead of
+# allocating a fresh copy of every array.
+
+class AgentState(NamedTuple):
+    """Per-agent arrays (compact layout, see FixedGPUABM.TIMER_DTYPES)"""
+    flags: jax.Array
+    long_covid_severity: jax.Array
+    long_covid_duration: jax.Array
+    long_covid_recovery_group: jax.Array
+    lc_onset_day: jax.Array
+    virus_check_timer: jax.Array
+    number_of_infection: jax.Array
+    infection_start_tick: jax.Array
+    infectious_start: jax.Array
+    infectious_end: jax.Array
+    transfer_active_duration: jax.Array
+    symptomatic_start: jax.Array
+    symptomatic_duration: jax.Array
+    age: jax.Array
+    gender: jax.Array
+    health_risk_level: jax.Array
+    vaccinated_time: jax.Array
+
+
+class RunAccumulators(NamedTuple):
+    """Scalars carried across days by the compiled run function"""
+    key: jax.Array
+    active: jax.Array
+    days_run: jax.Array
+    total_reinfected: jax.Array
+    min_productivity: jax.Array
+    # Epidemic curve summaries, so no timeseries has to leave the device
+    peak_infected: jax.Array
+    day_of_peak: jax.Array
+    peak_incidence: jax.Array
+    day_of_peak_incidence: jax.Array
+    symptomatic_days: jax.Array
+    peak_long_covid: jax.Array
+
+
+# Config entries passed to the compiled step as traced scalars, so changing
+# their values never triggers a recompile.
+STEP_PARAM_KEYS = (
+    'max_days', 'covid_spread_chance_pct', 'precaution_pct', 'v_start_time',
+    'infected_period', 'active_duration', 'immune_period', 'incubation_period',
+    'symptomatic_duration_min', 'symptomatic_duration_mid',
+    'symptomatic_duration_max', 'symptomatic_duration_dev', 'asymptomatic_pct',
+    'effect_of_reinfection', 'long_covid', 'long_covid_time_threshold',
+    'asymptomatic_lc_mult', 'lc_incidence_mult_female', 'lc_base_fast_prob',
+    'lc_base_persistent_prob', 'reinfection_new_onset_mult', 'lc_onset_base_pct',
+    'efficiency_pct', 'boosted_pct', 'vaccination_decay',
+)
+
+# Days simulated per compiled call (also the verbose progress interval)
+RUN_CHUNK_DAYS = 30
+
+# Contact network generator (FixedGPUABM._create_network_simple): fixed
+# RandomState seed and per-agent degree cap
+NETWORK_SEED = 42
+NETWORK_MAX_DEGREE = 50
+
+# Config keys that only act from vaccination onwards (see FixedGPUABM.fork_scenarios)
+FORK_KEYS = ('v_start_time', 'vaccination_pct', 'efficiency_pct', 'boosted_pct', 'vaccination_decay')
+
+# Config keys read while initializing a model (network, demographics and the
+# seed infections); every other key only affects the daily dynamics
+INIT_KEYS = (
+    'avg_degree', 'age_range', 'male_population_pct', 'super_immune_pct', 'initial_infected_agents',
+    'active_duration', 'infected_period', 'asymptomatic_pct', 'incubation_period',
+    'symptomatic_duration_min', 'symptomatic_duration_max', 'symptomatic_duration_mid',
+    'symptomatic_duration_dev', 'effect_of_reinfection', 'common_random_numbers',
+)
+
+
+def step_params(config, N):
+    """Build the traced parameter dict for the compiled step"""
+    # infectious_end reaches infected_period (see _infect), and the timers
+    # holding it are int8
+    timer_max = int(np.iinfo(FixedGPUABM.TIMER_DTYPES['infectious_end']).max)
+    if config['infected_period'] > timer_max:
+        raise ValueError(f"infected_period={config['infected_period']} exceeds the infection "
+                         f"timers' range (at most {timer_max} days)")
+    params = {k: jnp.asarray(float(config[k]), dtype=jnp.float32) for k in STEP_PARAM_KEYS}
+    params['vaccination_target'] = jnp.asarray(int(N * config['vaccination_pct'] / 100), dtype=jnp.int32)
+    params['n_agents'] = jnp.asarray(float(N), dtype=jnp.float32)
+    return params
+
+
+def _put(arr, mask, value):
+    """Masked assignment that keeps ``arr``'s compact dtype"""
+    return jnp.where(mask, value, arr).astype(arr.dtype)
+
+
+def _agent_draws(sample, key, p, shape, *counters):
+    """``sample(key, shape)`` (random.uniform, random.normal, ...) with one
+    row per agent.
+    
+    With ``common_random_numbers`` each agent's row is keyed by its index and
+    ``counters`` (per-agent event counters such as the infection number)
+    instead of being cut from one draw, so runs that differ only in their
+    parameters give an agent the same numbers for the same event whatever
+    day it falls on. The run key stays fixed in that mode (see _run_days),
+    which makes ``key`` a per-purpose key.
+    
+    The mode is a Python bool in ``p`` (see _with_crn), so each mode compiles
+    its own executable; as a traced flag, a batch of runs would evaluate
+    both draw paths for every draw.
+    """
+    if not p['common_random_numbers']:
+        return sample(key, shape)
+    
+    def row(i, *c):
+        k = random.fold_in(key, i)
+        for x in c:
+            k = random.fold_in(k, x)
+        return sample(k, shape[1:])
+    return jax.vmap(row)(jnp.arange(shape[0]), *counters)
+
+
+def _with_crn(p, crn):
+    """Step params with the static common-random-numbers mode (see _agent_draws)"""
+    return {**p, 'common_random_numbers': bool(crn)}
+
+
+def _infect(state, new_mask, day, key, p):
+    """Set up infection with symptom timing for every agent in ``new_mask``"""
+    N = state.flags.shape[0]
+    k_len, k_asym, k_inc, k_dur, k_worsen = random.split(key, 5)
+    number_of_infection = _put(state.number_of_infection, new_mask, state.number_of_infection + 1)
+    episode = (number_of_infection,)
+    
+    # Contagious period
+    active_duration = p['active_duration'].astype(jnp.int32)
+    drawn_length = 1 + _agent_draws(lambda k, s: random.randint(k, s, 0, active_duration),
+                                    k_len, p, (N,), *episode)
+    max_length = jnp.maximum(1, p['infected_period'].astype(jnp.int32) - 1)
+    transfer_duration = jnp.minimum(drawn_length, max_length)
+    
+    # Symptom onset and duration
+    is_asymptomatic = _agent_draws(random.uniform, k_asym, p, (N,), *episode) * 100 < p['asymptomatic_pct']
+    incubation_period = p['incubation_period'].astype(jnp.int32)
+    incubation = 1 + _agent_draws(lambda k, s: random.randint(k, s, 0, incubation_period),
+                                  k_inc, p, (N,), *episode)
+    incubation = jnp.minimum(incubation, transfer_duration)
+    
+    base_duration = (_agent_draws(random.normal, k_dur, p, (N,), *episode) * p['symptomatic_duration_dev']
+                     + p['symptomatic_duration_mid'])
+    base_duration = jnp.clip(base_duration, p['symptomatic_duration_min'], p['symptomatic_duration_max'])
+    symptom_duration = (base_duration + p['effect_of_reinfection'] * number_of_infection).astype(jnp.int32)
+    
+    # If already has LC, make symptoms 50% longer and worsen LC
+    has_lc = has_flag(state.flags, PERSISTENT_LONG_COVID)
+    symptom_duration = jnp.where(has_lc, (symptom_duration * 1.5).astype(jnp.int32), symptom_duration)
+    worsen = new_mask & ~is_asymptomatic & has_lc
+    
+    severity = jnp.where(worsen, state.long_covid_severity + 10, state.long_covid_severity)
+    severity = jnp.where(jnp.any(worsen), jnp.clip(severity, 5, 90), severity)
+    
+    # Group worsening
+    group = state.long_covid_recovery_group
+    worsen_roll = _agent_draws(random.uniform, k_worsen, p, (N,), *episode) * 100
+    group = jnp.where(worsen & (group == 0) & (worsen_roll < 30), 1,
+                      jnp.where(worsen & (group == 1) & (worsen_roll < 20), 2, group))
+    group = jnp.where(new_mask & ~has_lc, -1, group)
+    
+    flags = raise_flag(state.flags, INFECTED, new_mask)
+    flags = clear_flag(flags, IMMUNED, new_mask)
+    
+    return state._replace(
+        flags=flags,
+        infection_start_tick=_put(state.infection_start_tick, new_mask, day),
+        virus_check_timer=_put(state.virus_check_timer, new_mask, 0),
+        number_of_infection=number_of_infection,
+        transfer_active_duration=_put(state.transfer_active_duration, new_mask, transfer_duration),
+        infectious_start=_put(state.infectious_start, new_mask, 1),
+        infectious_end=_put(state.infectious_end, new_mask, 1 + transfer_duration),
+        symptomatic_start=_put(state.symptomatic_start, new_mask,
+                               jnp.where(is_asymptomatic, 0, incubation)),
+        symptomatic_duration=_put(state.symptomatic_duration, new_mask,
+                                  jnp.where(is_asymptomatic, 0, symptom_duration)),
+        long_covid_severity=severity.astype(state.long_covid_severity.dtype),
+        long_covid_recovery_group=group.astype(state.long_covid_recovery_group.dtype),
+    )
+
+
+def _lc_onset_prob(state, is_asymptomatic, p):
+    """LC onset probability with all multipliers (per agent)"""
+    age = state.age
+    multiplier = jnp.select([age < 30, (age >= 50) & (age <= 64), age >= 65],
+                            [0.9, 1.2, 1.3], default=1.0)
+    multiplier *= jnp.where(state.gender == 1, p['lc_incidence_mult_female'], 1.0)
+    multiplier *= jnp.where(has_flag(state.flags, VACCINATED), 0.7, 1.0)
+    
+    first_onset = (state.number_of_infection > 1) & (state.long_covid_recovery_group < 0)
+    multiplier *= jnp.where(first_onset, p['reinfection_new_onset_mult'], 1.0)
+    
+    if is_asymptomatic:
+        multiplier *= p['asymptomatic_lc_mult']
+    
+    return jnp.clip(p['lc_onset_base_pct'] * multiplier, 0, 100)
+
+
+def _assign_long_covid_group(state, mask, key, p):
+    """Assign LC recovery group and severity for every agent in ``mask``"""
+    N = state.flags.shape[0]
+    w_fast = p['lc_base_fast_prob']
+    w_pers = p['lc_base_persistent_prob']
+    w_sum = w_fast + w_pers
+    
+    over = w_sum > 100
+    w_fast = jnp.where(over, 100 * w_fast / w_sum, w_fast)
+    w_pers = jnp.where(over, 100 * w_pers / w_sum, w_pers)
+    w_grad = 100 - jnp.where(over, 100.0, w_sum)
+    
+    elderly = (state.age >= 65) & (w_grad >= 2)
+    w_pers = w_pers + jnp.where(elderly, 2.0, 0.0)
+    w_grad = w_grad - jnp.where(elderly, 2.0, 0.0)
+    
+    long_symptoms = (state.symptomatic_duration > 21) & (w_grad >= 4)
+    w_pers = w_pers + jnp.where(long_symptoms, 4.0, 0.0)
+    w_grad = w_grad - jnp.where(long_symptoms, 4.0, 0.0)
+    
+    total = w_fast + w_pers + w_grad
+    total = jnp.where(total <= 0, 100.0, total)
+    
+    k_group, k_severity = random.split(key)
+    r = _agent_draws(random.uniform, k_group, p, (N,), state.number_of_infection) * total
+    group = jnp.where(r < w_fast, 0, jnp.where(r < w_fast + w_pers, 2, 1))
+    
+    z = _agent_draws(random.normal, k_severity, p, (N,), state.number_of_infection)
+    severity = jnp.select([group == 0, group == 2], [z * 15 + 30, z * 20 + 70], default=z * 20 + 50)
+    severity = jnp.clip(severity, 5, 100)
+    
+    return state._replace(
+        flags=raise_flag(state.flags, PERSISTENT_LONG_COVID, mask),
+        long_covid_duration=_put(state.long_covid_duration, mask, 0),
+        long_covid_recovery_group=_put(state.long_covid_recovery_group, mask, group),
+        long_covid_severity=_put(state.long_covid_severity, mask, severity),
+    )
+
+
+def _do_long_covid_checks(state, key, p):
+    """LC recovery with Weibull hazard"""
+    lc_mask = has_flag(state.flags, PERSISTENT_LONG_COVID)
+    duration = _put(state.long_covid_duration, lc_mask, state.long_covid_duration + 1)
+    group = state.long_covid_recovery_group
+    k = jnp.take(LC_WEIBULL_K_TABLE, group.astype(jnp.int32) + 1)
+    lam = jnp.take(LC_WEIBULL_LAMBDA_TABLE, group.astype(jnp.int32) + 1)
+    
+    checked = lc_mask & (duration > 0) & (k > 0) & (lam > 0)
+    safe_lam = jnp.where(checked, lam, 1.0)
+    t_scaled = duration / safe_lam
+    hazard = (k / safe_lam) * (t_scaled ** (k - 1))
+    daily_prob = jnp.clip((1 - jnp.exp(-hazard)) * 100, 0.01, 10.0)
+    
+    persistent_mult = jnp.where(duration > 1095, 0.3 * 0.1, 0.3)
+    daily_prob *= jnp.select([group == 0, group == 2], [2.0, persistent_mult], default=1.0)
+    daily_prob = jnp.clip(daily_prob, 0, 15)
+    
+    roll = _agent_draws(random.uniform, key, p, lc_mask.shape, state.number_of_infection, duration)
+    recovered = checked & (roll * 100 < daily_prob)
+    improving = checked & ~recovered & (group == 1) & (duration > 30)
+    
+    severity = jnp.where(improving, jnp.clip(state.long_covid_severity - 0.05, 5, 100),
+                         state.long_covid_severity)
+    
+    return state._replace(
+        flags=clear_flag(state.flags, PERSISTENT_LONG_COVID, recovered),
+        long_covid_severity=_put(severity, recovered, 0.0),
+        long_covid_duration=_put(duration, recovered, 0),
+        long_covid_recovery_group=_put(group, recovered, -1),
+    )
+
+
+def _process_pending_lc(state, day, key, p):
+    """Activate pending LC cases"""
+    pending = has_flag(state.flags, LC_PENDING) & (day >= state.lc_onset_day)
+    new_cases = pending & ~has_flag(state.flags, PERSISTENT_LONG_COVID)
+    state = state._replace(flags=clear_flag(state.flags, LC_PENDING, pending))
+    return _assign_long_covid_group(state, new_cases, key, p)
+
+
+def _long_covid_update(state, day, key, p):
+    k_checks, k_pending = random.split(key)
+    state = _do_long_covid_checks(state, k_checks, p)
+    return _process_pending_lc(state, day, k_pending, p)
+
+
+def _update_infected_agents(state, key, p):
+    """Update infected agents AND check for LC onset"""
+    infected = has_flag(state.flags, INFECTED)
+    timer = _put(state.virus_check_timer, infected, state.virus_check_timer + 1)
+    symp_start = state.symptomatic_start
+    symp_dur = state.symptomatic_duration
+    
+    is_symptomatic = (symp_start > 0) & (timer >= symp_start) & (timer < symp_start + symp_dur)
+    flags = jnp.where(infected, set_flag(state.flags, SYMPTOMATIC, is_symptomatic), state.flags)
+    state = state._replace(flags=flags, virus_check_timer=timer)
+    
+    threshold = p['long_covid_time_threshold']
+    eligible = infected & ~has_flag(flags, PERSISTENT_LONG_COVID) & (p['long_covid'] > 0)
+    k_a, k_b, k_c = random.split(key, 3)
+    
+    # Path A: ASYMPTOMATIC
+    path_a = eligible & (timer >= p['infected_period']) & (symp_start == 0)
+    path_a &= (_agent_draws(random.uniform, k_a, p, timer.shape, state.number_of_infection) * 100
+               < _lc_onset_prob(state, True, p))
+    
+    # Path C: SYMPTOMATIC ≤ 30 days
+    path_c = eligible & (symp_start > 0) & (symp_dur <= threshold) & (timer == symp_start + symp_dur)
+    path_c &= (_agent_draws(random.uniform, k_c, p, timer.shape, state.number_of_infection) * 100
+               < _lc_onset_prob(state, False, p))
+    
+    pending = path_a | path_c
+    state = state._replace(
+        flags=raise_flag(state.flags, LC_PENDING, pending),
+        lc_onset_day=_put(state.lc_onset_day, pending, state.infection_start_tick + threshold),
+    )
+    
+    # Path B: SYMPTOMATIC > 30 days
+    path_b = eligible & (symp_start > 0) & (symp_dur > threshold) & (timer == symp_start + threshold)
+    state = _assign_long_covid_group(state, path_b, k_b, p)
+    
+    become_immune = infected & (state.virus_check_timer >= p['infected_period'])
+    flags = clear_flag(state.flags, INFECTED, become_immune)
+    return state._replace(
+        flags=raise_flag(flags, IMMUNED, become_immune),
+        virus_check_timer=_put(state.virus_check_timer, become_immune, 0),
+    )
+
+
+def _update_immune_agents(state, p):
+    """Update immune agents"""
+    immune = has_flag(state.flags, IMMUNED)
+    timer = _put(state.virus_check_timer, immune, state.virus_check_timer + 1)
+    lose_immunity = immune & (timer >= p['infected_period'] + p['immune_period'])
+    return state._replace(
+        flags=clear_flag(state.flags, IMMUNED, lose_immunity),
+        virus_check_timer=_put(timer, lose_immunity, 0),
+    )
+
+
+def _transmission_step(state, neighbors, day, key, p):
+    """Transmission with precaution behavior (all contacts in parallel)"""
+    flags = state.flags
+    timer = state.virus_check_timer
+    k_precaution, k_vaccine, k_spread, k_infect = random.split(key, 4)
+    # Source-side draws follow the source's infection and its day within it
+    episode_day = (state.number_of_infection, timer)
+    
+    infectious = (has_flag(flags, INFECTED) &
+                  (timer >= state.infectious_start) &
+                  (timer < state.infectious_end))
+    
+    # Symptomatic sources stay home with probability precaution_pct
+    careful = (has_flag(flags, SYMPTOMATIC) &
+               (state.symptomatic_start > 0) & (timer > state.symptomatic_start))
+    careful &= _agent_draws(random.uniform, k_precaution, p, flags.shape, *episode_day) * 100 < p['precaution_pct']
+    spreading = infectious & ~careful
+    
+    valid = neighbors >= 0
+    target = jnp.where(valid, neighbors, 0)
+    susceptible = (flags[target] & (INFECTED | IMMUNED | SUPER_IMMUNE)) == 0
+    contact = spreading[:, None] & valid & susceptible
+    
+    # Vaccine protection, rolled per contact
+    efficiency = jnp.where(p['vaccination_decay'] > 0,
+                           jnp.maximum(0, p['efficiency_pct'] - 0.11 * state.vaccinated_time),
+                           p['efficiency_pct'])
+    protected = has_flag(flags, VACCINATED)[target]
+    protected &= _agent_draws(random.uniform, k_vaccine, p, target.shape, *episode_day) * 100 < efficiency[target]
+    
+    age_idx = _age_index(state.age)
+    age_ratio = jnp.take(COVID_AGE_PROB_TABLE, age_idx) / (jnp.take(US_AGE_PROB_TABLE, age_idx) + 1e-9)
+    infection_prob = jnp.clip(p['covid_spread_chance_pct'] * age_ratio, 0, 100)
+    
+    success = contact & ~protected
+    success &= _agent_draws(random.uniform, k_spread, p, target.shape, *episode_day) * 100 < infection_prob[target]
+    
+    hits = jnp.zeros(flags.shape, dtype=jnp.int32).at[target].add(success.astype(jnp.int32))
+    newly_infected = hits > 0
+    daily_infections = jnp.sum(newly_infected, dtype=jnp.int32)
+    daily_reinfections = jnp.sum(newly_infected & (state.number_of_infection > 0), dtype=jnp.int32)
+    
+    return _infect(state, newly_infected, day, k_infect, p), daily_infections, daily_reinfections
+
+
+def _vaccination_status(state, key, p):
+    """Vaccinate random unvaccinated agents up to vaccination_target"""
+    vaccinated = has_flag(state.flags, VACCINATED)
+    n_to_vaccinate = jnp.maximum(p['vaccination_target'] - jnp.sum(vaccinated, dtype=jnp.int32), 0)
+    
+    excluded = has_flag(state.flags, VACCINATED | PADDING)
+    priority = jnp.where(excluded, jnp.inf, _agent_draws(random.uniform, key, p, vaccinated.shape))
+    cutoffs = jnp.concatenate([jnp.sort(priority), jnp.array([jnp.inf])])
+    chosen = priority < cutoffs[n_to_vaccinate]
+    
+    return state._replace(
+        flags=raise_flag(state.flags, VACCINATED, chosen),
+        vaccinated_time=_put(state.vaccinated_time, chosen, 1),
+    )
+
+
+def _update_vaccination_time(state, day, key, p):
+    """Update vaccination time and boosters"""
+    vaccinated = has_flag(state.flags, VACCINATED)
+    vaccinated_time = _put(state.vaccinated_time, vaccinated, state.vaccinated_time + 1)
+    
+    need_booster = vaccinated & (vaccinated_time >= 180)
+    days = jnp.broadcast_to(day, vaccinated.shape)
+    get_booster = _agent_draws(random.uniform, key, p, vaccinated.shape, days) * 100 < p['boosted_pct']
+    
+    vaccinated_time = _put(vaccinated_time, need_booster, jnp.where(get_booster, 1, 0))
+    return state._replace(
+        flags=clear_flag(state.flags, VACCINATED, need_booster & ~get_booster),
+        vaccinated_time=vaccinated_time,
+    )
+
+
+def _calculate_productivity(state, p):
+    """Current productivity (% of agents not lost to symptoms or LC)"""
+    symptomatic = has_flag(state.flags, SYMPTOMATIC)
+    lc_only = has_flag(state.flags, PERSISTENT_LONG_COVID) & ~symptomatic
+    symptomatic_loss = jnp.sum(symptomatic, dtype=jnp.float32)
+    lc_loss = jnp.sum(jnp.where(lc_only, state.long_covid_severity / 100.0, 0.0))
+    return (1 - (symptomatic_loss + lc_loss) / p['n_agents']) * 100
+
+
+def _daily_counts(state, p):
+    """Start-of-day (infected, immune, long_covid, productivity)"""
+    return (jnp.sum(has_flag(state.flags, INFECTED), dtype=jnp.int32),
+            jnp.sum(has_flag(state.flags, IMMUNED), dtype=jnp.int32),
+            jnp.sum(has_flag(state.flags, PERSISTENT_LONG_COVID), dtype=jnp.int32),
+            _calculate_productivity(state, p))
+
+
+def _daily_step(state, neighbors, day, key, p, batch_axis=None):
+    """Advance every agent by one day; returns (state, daily_infections, daily_reinfections)"""
+    k_vacc, k_lc, k_inf, k_trans, k_boost = random.split(key, 5)
+    
+    # Branches close over ``p``: as a cond operand its static CRN mode would be traced
+    vaccinate = day == p['v_start_time']
+    if batch_axis is None:
+        state = lax.cond(vaccinate, lambda s, k: _vaccination_status(s, k, p), lambda s, k: s, state, k_vacc)
+    else:
+        # Under vmap a per-run predicate makes lax.cond run the sort every day;
+        # branch on whether any run in the batch vaccinates today instead
+        def vaccinate_some(s, k):
+            return jax.tree_util.tree_map(partial(jnp.where, vaccinate), _vaccination_status(s, k, p), s)
+        any_today = lax.psum(vaccinate.astype(jnp.int32), batch_axis) > 0
+        state = lax.cond(any_today, vaccinate_some, lambda s, k: s, state, k_vacc)
+    state = lax.cond(p['long_covid'] > 0, lambda s, k: _long_covid_update(s, day, k, p),
+                     lambda s, k: s, state, k_lc)
+    state = _update_infected_agents(state, k_inf, p)
+    state, daily_infections, daily_reinfections = _transmission_step(state, neighbors, day, k_trans, p)
+    state = _update_immune_agents(state, p)
+    state = _update_vaccination_time(state, day, k_boost, p)
+    return state, daily_infections, daily_reinfections
+
+
+def _run_days(state, acc, neighbors, p, start_day, n_days, crn=False, batch_axis=None):
+    """Simulate ``n_days`` days from ``start_day``; days after the epidemic
+    ends (or past ``max_days``) leave the state untouched.
+    
+    ``crn`` (static) selects common random numbers; ``batch_axis`` names the
+    vmap axis when runs are batched (see _run_days_batched)."""
+    p = _with_crn(p, crn)
+    
+    def body(carry, day):
+        state, acc = carry
+        counts = _daily_counts(state, p)
+        running = acc.active & (day < p['max_days'])
+        key, subkey = random.split(acc.key)
+        if crn:
+            # Common random numbers: every day reuses the run key (see _agent_draws)
+            key = subkey = acc.key
+        
+        # SYMPTOMATIC is left set after recovery, so only count current infections
+        n_symptomatic = jnp.sum(has_flag(state.flags, SYMPTOMATIC) & has_flag(state.flags, INFECTED),
+                                dtype=jnp.int32)
+        
+        state, daily_infections, daily_reinfections = lax.cond(
+            running,
+            lambda s: _daily_step(s, neighbors, day, subkey, p, batch_axis),
+            lambda s: (s, jnp.int32(0), jnp.int32(0)),
+            state,
+        )
+        alive = jnp.any(has_flag(state.flags, INFECTED | IMMUNED))
+        
+        # Start-of-day prevalence (as in the timeseries); first day wins ties
+        new_peak = running & (counts[0] > acc.peak_infected)
+        new_peak_incidence = running & (daily_infections > acc.peak_incidence)
+        acc = RunAccumulators(
+            key=key,
+            active=acc.active & (~running | alive),
+            days_run=acc.days_run + running.astype(jnp.int32),
+            total_reinfected=acc.total_reinfected + daily_reinfections,
+            min_productivity=jnp.where(running, jnp.minimum(acc.min_productivity, counts[3]),
+                                       acc.min_productivity),
+            peak_infected=jnp.where(new_peak, counts[0], acc.peak_infected),
+            day_of_peak=jnp.where(new_peak, day, acc.day_of_peak),
+            peak_incidence=jnp.where(new_peak_incidence, daily_infections, acc.peak_incidence),
+            day_of_peak_incidence=jnp.where(new_peak_incidence, day, acc.day_of_peak_incidence),
+            symptomatic_days=acc.symptomatic_days + jnp.where(running, n_symptomatic, 0),
+            peak_long_covid=jnp.where(running, jnp.maximum(acc.peak_long_covid, counts[2]),
+                                      acc.peak_long_covid),
+        )
+        return (state, acc), (running,) + counts
+    
+    days = start_day + jnp.arange(n_days, dtype=jnp.int32)
+    (state, acc), daily = lax.scan(body, (state, acc), days)
+    return state, acc, daily
+
+
+def _curve_metrics(acc):
+    """run_simulation() results read from one run's accumulators"""
+    return {
+        'peak_infected': int(acc.peak_infected),
+        'day_of_peak': int(acc.day_of_peak),
+        'peak_incidence': int(acc.peak_incidence),
+        'day_of_peak_incidence': int(acc.day_of_peak_incidence),
+        'symptomatic_days': int(acc.symptomatic_days),
+        'peak_long_covid': int(acc.peak_long_covid),
+    }
+
+
+def _timeseries_rows(start_day, daily):
+    """run_simulation() timeseries rows for the running days of one chunk"""
+    running, n_infected, n_immune, n_lc, productivity = (np.asarray(x) for x in daily)
+    return [{
+        'day': start_day + int(offset),
+        'infected': int(n_infected[offset]),
+        'immune': int(n_immune[offset]),
+        'long_covid': int(n_lc[offset]),
+        'productivity': float(productivity[offset])
+    } for offset in np.flatnonzero(running)]
+
+
+def _infect_agents(state, new_mask, day, key, p, crn=False):
+    return _infect(state, new_mask, day, key, _with_crn(p, crn))
+
+
+# Agent buffers (and the accumulators) are donated: XLA writes the new day's
+# state into the memory of the old one.
+run_days = jax.jit(_run_days, static_argnames=('n_days', 'crn'), donate_argnums=(0, 1))
+infect_agents = jax.jit(_infect_agents, static_argnames=('crn',), donate_argnums=(0,))
+
+
+def live_device_bytes():
+    """Total bytes held by live device arrays"""
+    return sum(a.nbytes for a in jax.live_arrays())
+
+
+# ========== COMPILATION CACHE / AOT EXPORT ==========
+# Fresh worker processes otherwise pay full tracing + XLA compilation before
+# the first simulated day. The persistent cache stores XLA executables on
+# disk; exported run functions (one per shape) skip tracing and lowering.
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'covid_abm')
+
+# Exported run functions loaded from disk, keyed by (padded N, neighbor width)
+_exported_runs = {}
+
+# Export directories registered by enable_compilation_cache(), loaded on first
+# run so that enabling the cache does not initialise the backend
+_pending_export_dirs = []
+
+
+def _register_export_types():
+    from jax import export
+    for cls in (AgentState, RunAccumulators):
+        try:
+            export.register_namedtuple_serialization(cls, serialized_name=f'covid_abm.{cls.__name__}')
+        except ValueError:
+            pass  # already registered
+    return export
+
+
+def enable_compilation_cache(cache_dir=None):
+    """Persist compiled executables under ``cache_dir`` and load any
+    exported run functions found there.
+    
+    Defaults to $COVID_ABM_CACHE_DIR, then ~/.cache/covid_abm.
+    """
+    cache_dir = cache_dir or os.environ.get('COVID_ABM_CACHE_DIR') or DEFAULT_CACHE_DIR
+    jax.config.update('jax_compilation_cache_dir', os.path.join(cache_dir, 'xla'))
+    jax.config.update('jax_persistent_cache_min_compile_time_secs', 0)
+    jax.config.update('jax_persistent_cache_min_entry_size_bytes', 0)
+    _pending_export_dirs.append(os.path.join(cache_dir, 'exported'))
+    return cache_dir
+
+
+def _load_pending_exports():
+    while _pending_export_dirs:
+        load_exported_runs(_pending_export_dirs.pop(0))
+
+
+def _exported_name(n_padded, width):
+    return f"run_days_{n_padded}x{width}{_exported_suffix()}"
+
+
+def _exported_suffix():
+    # Exports from another engine version have other semantics (and arguments)
+    return f"_d{RUN_CHUNK_DAYS}_{jax.default_backend()}_{engine_version()}.jaxexport"
+
+
+def export_run_function(abm, export_dir):
+    """Serialize the compiled run function for ``abm``'s array shapes"""
+    export = _register_export_types()
+    args = (abm.state, abm._new_accumulators(), abm.neighbors, step_params(abm.config, abm.N), 0)
+    specs = jax.tree_util.tree_map(lambda x: jax.ShapeDtypeStruct(jnp.shape(x), jnp.result_type(x)), args)
+    exported = export.export(run_days)(*specs, n_days=RUN_CHUNK_DAYS)
+    
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, _exported_name(*abm.neighbors.shape))
+    with open(path, 'wb') as f:
+        f.write(exported.serialize())
+    return path
+
+
+def load_exported_runs(export_dir):
+    """Register every exported run function in ``export_dir`` for this backend"""
+    if not os.path.isdir(export_dir):
+        return 0
+    
+    suffix = _exported_suffix()
+    loaded = 0
+    for name in sorted(os.listdir(export_dir)):
+        if not (name.startswith('run_days_') and name.endswith(suffix)):
+            continue
+        export = _register_export_types()
+        with open(os.path.join(export_dir, name), 'rb') as f:
+            exported = export.deserialize(bytearray(f.read()))
+        n_padded, width = (int(x) for x in name[len('run_days_'):-len(suffix)].split('x'))
+        _exported_runs[(n_padded, width)] = jax.jit(exported.call, donate_argnums=(0, 1))
+        loaded += 1
+    return loaded
 
 
 class FixedGPUABM:
     """GPU ABM with corrected Long COVID implementation"""
     
+    # Timer widths: int16 covers ~89 years of days, int8 covers the short
+    # incubation / contagious windows (bounded by the config periods).
+    TIMER_DTYPES = {
+        'long_covid_duration': jnp.int16,
+        'lc_onset_day': jnp.int16,
+        'virus_check_timer': jnp.int16,
+        'number_of_infection': jnp.int16,
+        'infection_start_tick': jnp.int16,
+        'infectious_start': jnp.int8,
+        'infectious_end': jnp.int8,
+        'transfer_active_duration': jnp.int8,
+        'symptomatic_start': jnp.int8,
+        'symptomatic_duration': jnp.int16,
+        'vaccinated_time': jnp.int16,
+    }
+    
     def __init__(self):
         self.key = random.PRNGKey(42)
         self.config = self._get_netlogo_default_config()
         
-        # Agent state arrays
-        self.infected = None
-        self.immuned = None
-        self.symptomatic = None
-        self.super_immune = None
-        self.persistent_long_covid = None
-        self.long_covid_severity = None
-        self.long_covid_duration = None
-        self.long_covid_recovery_group = None
-        self.long_covid_weibull_k = None
-        self.long_covid_weibull_lambda = None
-        self.lc_pending = None
-        self.lc_onset_day = None
-        self.virus_check_timer = None
-        self.number_of_infection = None
-        self.infection_start_tick = None
-        self.infectious_start = None
-        self.infectious_end = None
-        self.transfer_active_duration = None
-        self.symptomatic_start = None
-        self.symptomatic_duration = None
-        self.age = None
-        self.gender = None
-        self.health_risk_level = None
-        self.covid_age_prob = None
-        self.us_age_prob = None
-        self.vaccinated = None
-        self.vaccinated_time = None
+        # Agent state arrays (AgentState; booleans live in the packed ``flags`` word)
+        self.state = None
         
         self.neighbors = None
         self.N = 0
+        self.N_padded = 0
+        self.bucket = None
+        self.sharding = None
         
+        # (accumulators, next day, timeseries) of an interrupted run, see load_checkpoint
+        self._progress = None
+    
+    def __getattr__(self, name):
+        # Expose AgentState fields (self.age, self.virus_check_timer, ...)
+        state = self.__dict__.get('state')
+        if state is not None and name in AgentState._fields:
+            return getattr(state, name)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+    
+    # ----- Boolean views of the packed flags -----
+    
+    @property
+    def infected(self):
+        return has_flag(self.state.flags, INFECTED)
+    
+    @property
+    def immuned(self):
+        return has_flag(self.state.flags, IMMUNED)
+    
+    @property
+    def symptomatic(self):
+        return has_flag(self.state.flags, SYMPTOMATIC)
+    
+    @property
+    def super_immune(self):
+        return has_flag(self.state.flags, SUPER_IMMUNE)
+    
+    @property
+    def persistent_long_covid(self):
+        return has_flag(self.state.flags, PERSISTENT_LONG_COVID)
+    
+    @property
+    def lc_pending(self):
+        return has_flag(self.state.flags, LC_PENDING)
+    
+    @property
+    def vaccinated(self):
+        return has_flag(self.state.flags, VACCINATED)
+    
+    @property
+    def valid(self):
+        """Real agents (False for bucket padding slots)"""
+        return ~has_flag(self.state.flags, PADDING)
+    
+    # ----- Table-derived per-agent values -----
+    
+    @property
+    def covid_age_prob(self):
+        return jnp.take(COVID_AGE_PROB_TABLE, _age_index(self.state.age))
+    
+    @property
+    def us_age_prob(self):
+        return jnp.take(US_AGE_PROB_TABLE, _age_index(self.state.age))
+    
+    @property
+    def long_covid_weibull_k(self):
+        return jnp.take(LC_WEIBULL_K_TABLE, self.state.long_covid_recovery_group.astype(jnp.int32) + 1)
+    
+    @property
+    def long_covid_weibull_lambda(self):
+        return jnp.take(LC_WEIBULL_LAMBDA_TABLE, self.state.long_covid_recovery_group.astype(jnp.int32) + 1)
+    
+    def memory_per_agent(self):
+        """Bytes of per-agent state (excluding the contact network)"""
+        return sum(a.dtype.itemsize for a in self.state)
+    
     def _get_netlogo_default_config(self):
         """NetLogo defaults with Long COVID ENABLED"""
         return {
@@ -92,53 +921,71 @@ class FixedGPUABM:
             'boosted_pct': 30.0,
             'vaccination_decay': True,
             'male_population_pct': 49.5,
+            
+            # Key random draws by agent and event rather than by day, so
+            # same-seed runs with different parameters stay paired
+            'common_random_numbers': False,
             'age_range': 100,
             'risk_level_2_pct': 4.0,
             'risk_level_3_pct': 40.0,
             'risk_level_4_pct': 6.0,
         }
     
-    def initialize_simulation(self, N=10000, seed=42, **kwargs):
-        """Initialize GPU simulation"""
+    def initialize_simulation(self, N=10000, seed=42, bucket=None, neighbors=None, agent_devices=None,
+                              **kwargs):
+        """Initialize GPU simulation
+        
+        ``bucket`` ('pow2' or '1.25x') pads the agent arrays to the next
+        population bucket so runs with different N reuse one executable.
+        The contact network does not depend on the seed, so ``neighbors``
+        from a run with the same N, avg_degree and bucket can be reused.
+        ``agent_devices`` splits the agents across several devices (padding
+        N up to a multiple of their count).
+        """
         self.N = N
+        self.N_padded = bucketed_size(N, bucket)
+        self.bucket = bucket
+        self.sharding = None
+        if agent_devices is not None and len(agent_devices) > 1:
+            self.sharding = agent_sharding(agent_devices)
+            self.N_padded = -(-self.N_padded // len(agent_devices)) * len(agent_devices)
         self.key = random.PRNGKey(seed)
         self.config.update(kwargs)
         
         self._initialize_agent_arrays()
-        self._create_network_simple()
+        if neighbors is None:
+            self._create_network_simple()
+        else:
+            self.neighbors = neighbors
         self._setup_demographics()
         self._seed_initial_infections()
+        
+        if self.sharding is not None:
+            self.state = jax.device_put(self.state, self.sharding)
     
     def _initialize_agent_arrays(self):
         """Initialize all arrays on GPU"""
-        N = self.N
-        self.infected = jnp.zeros(N, dtype=jnp.bool_)
-        self.immuned = jnp.zeros(N, dtype=jnp.bool_)
-        self.symptomatic = jnp.zeros(N, dtype=jnp.bool_)
-        self.super_immune = jnp.zeros(N, dtype=jnp.bool_)
-        self.persistent_long_covid = jnp.zeros(N, dtype=jnp.bool_)
-        self.long_covid_severity = jnp.zeros(N, dtype=jnp.float32)
-        self.long_covid_duration = jnp.zeros(N, dtype=jnp.int32)
-        self.long_covid_recovery_group = jnp.full(N, -1, dtype=jnp.int8)
-        self.long_covid_weibull_k = jnp.zeros(N, dtype=jnp.float32)
-        self.long_covid_weibull_lambda = jnp.zeros(N, dtype=jnp.float32)
-        self.lc_pending = jnp.zeros(N, dtype=jnp.bool_)
-        self.lc_onset_day = jnp.zeros(N, dtype=jnp.int32)
-        self.virus_check_timer = jnp.zeros(N, dtype=jnp.int32)
-        self.number_of_infection = jnp.zeros(N, dtype=jnp.int32)
-        self.infection_start_tick = jnp.zeros(N, dtype=jnp.int32)
-        self.infectious_start = jnp.ones(N, dtype=jnp.int32)
-        self.infectious_end = jnp.ones(N, dtype=jnp.int32)
-        self.transfer_active_duration = jnp.zeros(N, dtype=jnp.int32)
-        self.symptomatic_start = jnp.zeros(N, dtype=jnp.int32)
-        self.symptomatic_duration = jnp.zeros(N, dtype=jnp.int32)
-        self.age = jnp.zeros(N, dtype=jnp.int8)
-        self.gender = jnp.zeros(N, dtype=jnp.int8)
-        self.health_risk_level = jnp.ones(N, dtype=jnp.int8)
-        self.covid_age_prob = jnp.full(N, 15.0, dtype=jnp.float32)
-        self.us_age_prob = jnp.full(N, 13.0, dtype=jnp.float32)
-        self.vaccinated = jnp.zeros(N, dtype=jnp.bool_)
-        self.vaccinated_time = jnp.zeros(N, dtype=jnp.int32)
+        N = self.N_padded
+        t = self.TIMER_DTYPES
+        self.state = AgentState(
+            flags=jnp.where(jnp.arange(N) < self.N, 0, PADDING).astype(jnp.uint8),
+            long_covid_severity=jnp.zeros(N, dtype=jnp.float32),
+            long_covid_duration=jnp.zeros(N, dtype=t['long_covid_duration']),
+            long_covid_recovery_group=jnp.full(N, -1, dtype=jnp.int8),
+            lc_onset_day=jnp.zeros(N, dtype=t['lc_onset_day']),
+            virus_check_timer=jnp.zeros(N, dtype=t['virus_check_timer']),
+            number_of_infection=jnp.zeros(N, dtype=t['number_of_infection']),
+            infection_start_tick=jnp.zeros(N, dtype=t['infection_start_tick']),
+            infectious_start=jnp.ones(N, dtype=t['infectious_start']),
+            infectious_end=jnp.ones(N, dtype=t['infectious_end']),
+            transfer_active_duration=jnp.zeros(N, dtype=t['transfer_active_duration']),
+            symptomatic_start=jnp.zeros(N, dtype=t['symptomatic_start']),
+            symptomatic_duration=jnp.zeros(N, dtype=t['symptomatic_duration']),
+            age=jnp.zeros(N, dtype=jnp.int8),
+            gender=jnp.zeros(N, dtype=jnp.int8),
+            health_risk_level=jnp.ones(N, dtype=jnp.int8),
+            vaccinated_time=jnp.zeros(N, dtype=t['vaccinated_time']),
+        )
     
     def _create_network_simple(self):
         """Simple network creation"""
@@ -147,7 +994,7 @@ class FixedGPUABM:
         
         neighbors = [[] for _ in range(N)]
         target_edges = (avg_degree * N) // 2
-        rng = np.random.RandomState(42)
+        rng = np.random.RandomState(NETWORK_SEED)
         
         edges = 0
         attempts = 0
@@ -157,18 +1004,26 @@ class FixedGPUABM:
             i = rng.randint(0, N)
             j = rng.randint(0, N)
             
-            if i != j and j not in neighbors[i] and len(neighbors[i]) < 50:
+            if i != j and j not in neighbors[i] and len(neighbors[i]) < NETWORK_MAX_DEGREE:
                 neighbors[i].append(j)
                 neighbors[j].append(i)
                 edges += 1
             attempts += 1
         
         max_neighbors = max(len(n) for n in neighbors)
-        self.neighbors = jnp.full((N, max_neighbors), -1, dtype=jnp.int32)
+        if self.bucket:
+            max_neighbors = -(-max_neighbors // NEIGHBOR_BUCKET_SIZE) * NEIGHBOR_BUCKET_SIZE
         
+        # Padding rows (agents >= N) have no contacts
+        table = np.full((self.N_padded, max_neighbors), -1, dtype=np.int32)
         for i in range(N):
             if neighbors[i]:
-                self.neighbors = self.neighbors.at[i, :len(neighbors[i])].set(jnp.array(neighbors[i]))
+                table[i, :len(neighbors[i])] = neighbors[i]
+        if self.sharding is not None:
+            # Straight from host to the owning devices; no device holds the whole table
+            self.neighbors = jax.device_put(table, self.sharding)
+        else:
+            self.neighbors = jnp.asarray(table)
     
     def _setup_demographics(self):
         """Setup demographics"""
@@ -177,214 +1032,161 @@ class FixedGPUABM:
         
         # Age distribution
         key, subkey = random.split(key)
-        self.age = random.randint(subkey, (N,), 0, self.config['age_range']).astype(jnp.int8)
+        age = random.randint(subkey, (N,), 0, self.config['age_range']).astype(jnp.int8)
         
         # Gender
         key, subkey = random.split(key)
         male_prob = self.config['male_population_pct'] / 100.0
-        self.gender = random.bernoulli(subkey, male_prob, (N,)).astype(jnp.int8)
+        gender = random.bernoulli(subkey, male_prob, (N,)).astype(jnp.int8)
         
-        # Age probabilities
-        self._set_age_probabilities_vectorized()
+        # Age probabilities are looked up from COVID_AGE_PROB_TABLE / US_AGE_PROB_TABLE
         
         # Super-immune
         key, subkey = random.split(key)
         n_super = int(self.config['super_immune_pct'] * N / 100)
-        super_indices = random.choice(subkey, N, shape=(n_super,), replace=False)
-        super_mask = jnp.zeros(N, dtype=jnp.bool_)
-        self.super_immune = super_mask.at[super_indices].set(True)
-        
+        if self.config['common_random_numbers']:
+            # Lowest priorities first: a larger share contains the smaller one
+            super_indices = jnp.argsort(random.uniform(subkey, (N,)))[:n_super]
+        else:
+            super_indices = random.choice(subkey, N, shape=(n_super,), replace=False)
+        super_mask = jnp.zeros(self.N_padded, dtype=jnp.bool_).at[super_indices].set(True)
+        
+        padding = self.N_padded - N
+        self.state = self.state._replace(
+            age=jnp.pad(age, (0, padding)),
+            gender=jnp.pad(gender, (0, padding)),
+            flags=raise_flag(self.state.flags, SUPER_IMMUNE, super_mask),
+        )
         self.key = key
     
-    def _set_age_probabilities_vectorized(self):
-        """Set age probabilities"""
-        age = self.age
-        
-        covid_probs = jnp.select([
-            age < 10, age < 20, age < 30, age < 40, 
-            age < 50, age < 60, age < 70, age < 80
-        ], [
-            2.3, 5.1, 15.5, 16.9, 16.4, 16.4, 11.9, 7.0
-        ], default=8.5)
-        
-        us_probs = jnp.select([
-            age < 5, age < 15, age < 25, age < 35, age < 45,
-            age < 55, age < 65, age < 75, age < 85
-        ], [
-            5.7, 12.5, 13.0, 13.7, 13.1, 12.3, 12.9, 10.1, 4.9
-        ], default=1.8)
-        
-        self.covid_age_prob = covid_probs.astype(jnp.float32)
-        self.us_age_prob = us_probs.astype(jnp.float32)
-    
     def _seed_initial_infections(self):
         """Seed initial infections"""
         N = self.N
         key = self.key
         
         n_initial = min(self.config['initial_infected_agents'], N)
-        eligible_mask = ~self.super_immune
+        eligible_mask = ~self.super_immune & self.valid
         eligible_indices = jnp.where(eligible_mask)[0]
         n_initial = min(n_initial, len(eligible_indices))
         
         key, subkey = random.split(key)
-        infected_indices = random.choice(subkey, eligible_indices, shape=(n_initial,), replace=False)
-        
-        for idx in infected_indices:
-            idx = int(idx)
-            key, subkey = random.split(key)
-            self._infect_agent_with_symptoms(idx, 0, subkey)
+        if self.config['common_random_numbers']:
+            priority = jnp.where(eligible_mask, random.uniform(subkey, eligible_mask.shape), jnp.inf)
+            infected_indices = jnp.argsort(priority)[:n_initial]
+        else:
+            infected_indices = random.choice(subkey, eligible_indices, shape=(n_initial,), replace=False)
+        seed_mask = jnp.zeros(self.N_padded, dtype=jnp.bool_).at[infected_indices].set(True)
         
+        key, subkey = random.split(key)
+        self.state = infect_agents(self.state, seed_mask, 0, subkey, step_params(self.config, N),
+                                   crn=bool(self.config['common_random_numbers']))
         self.key = key
     
-    def _infect_agent_with_symptoms(self, agent_idx, day, key):
-        """Properly set up infection with symptom timing"""
-        self.infected = self.infected.at[agent_idx].set(True)
-        self.immuned = self.immuned.at[agent_idx].set(False)
-        self.infection_start_tick = self.infection_start_tick.at[agent_idx].set(day)
-        self.virus_check_timer = self.virus_check_timer.at[agent_idx].set(0)
-        self.number_of_infection = self.number_of_infection.at[agent_idx].add(1)
-        
-        # Set contagious period
-        key, subkey = random.split(key)
-        drawn_length = 1 + random.randint(subkey, (1,), 0, self.config['active_duration'])[0]
-        max_length = max(1, self.config['infected_period'] - 1)
-        transfer_duration = min(drawn_length, max_length)
-        
-        self.transfer_active_duration = self.transfer_active_duration.at[agent_idx].set(transfer_duration)
-        self.infectious_start = self.infectious_start.at[agent_idx].set(1)
-        self.infectious_end = self.infectious_end.at[agent_idx].set(1 + transfer_duration)
-        
-        # Decide if asymptomatic
-        key, subkey = random.split(key)
-        is_asymptomatic = random.uniform(subkey) * 100 < self.config['asymptomatic_pct']
-        
-        if is_asymptomatic:
-            self.symptomatic_start = self.symptomatic_start.at[agent_idx].set(0)
-            self.symptomatic_duration = self.symptomatic_duration.at[agent_idx].set(0)
+    def _new_accumulators(self):
+        # The accumulators are donated to the compiled run, so they get their
+        # own key buffer and self.key stays valid if a run fails partway
+        return RunAccumulators(
+            key=jnp.array(self.key, copy=True),
+            active=jnp.asarray(True),
+            days_run=jnp.asarray(0, dtype=jnp.int32),
+            total_reinfected=jnp.asarray(0, dtype=jnp.int32),
+            min_productivity=jnp.asarray(100.0, dtype=jnp.float32),
+            peak_infected=jnp.asarray(0, dtype=jnp.int32),
+            day_of_peak=jnp.asarray(0, dtype=jnp.int32),
+            peak_incidence=jnp.asarray(0, dtype=jnp.int32),
+            day_of_peak_incidence=jnp.asarray(0, dtype=jnp.int32),
+            symptomatic_days=jnp.asarray(0, dtype=jnp.int32),
+            peak_long_covid=jnp.asarray(0, dtype=jnp.int32),
+        )
+    
+    def _run_chunk(self, acc, params, start_day, n_days=RUN_CHUNK_DAYS):
+        """Advance ``n_days`` days through the compiled (buffer-donating) run function"""
+        _load_pending_exports()
+        crn = bool(self.config['common_random_numbers'])
+        exported = None
+        if self.sharding is None and n_days == RUN_CHUNK_DAYS and not crn:
+            exported = _exported_runs.get(self.neighbors.shape)
+        if exported is not None:
+            self.state, acc, daily = exported(self.state, acc, self.neighbors, params, start_day)
         else:
-            # Has symptoms
-            key, subkey = random.split(key)
-            incubation = 1 + random.randint(subkey, (1,), 0, self.config['incubation_period'])[0]
-            incubation = min(incubation, transfer_duration)
-            
-            self.symptomatic_start = self.symptomatic_start.at[agent_idx].set(incubation)
-            
-            # Calculate symptom duration
-            key, subkey = random.split(key)
-            base_duration = random.normal(subkey) * self.config['symptomatic_duration_dev'] + \
-                          self.config['symptomatic_duration_mid']
-            
-            base_duration = jnp.clip(
-                base_duration,
-                self.config['symptomatic_duration_min'],
-                self.config['symptomatic_duration_max']
-            )
-            
-            reinfection_add = self.config['effect_of_reinfection'] * int(self.number_of_infection[agent_idx])
-            symptom_duration = int(base_duration + reinfection_add)
-            
-            # If already has LC, make symptoms 50% longer and worsen LC
-            if self.persistent_long_covid[agent_idx]:
-                symptom_duration = int(symptom_duration * 1.5)
-                self.long_covid_severity = self.long_covid_severity.at[agent_idx].add(10)
-                self.long_covid_severity = jnp.clip(self.long_covid_severity, 5, 90)
-                
-                # Group worsening
-                current_group = int(self.long_covid_recovery_group[agent_idx])
-                key, subkey = random.split(key)
-                worsen_roll = random.uniform(subkey) * 100
-                
-                if current_group == 0 and worsen_roll < 30:
-                    self.long_covid_recovery_group = self.long_covid_recovery_group.at[agent_idx].set(1)
-                    self.long_covid_weibull_k = self.long_covid_weibull_k.at[agent_idx].set(1.2)
-                    self.long_covid_weibull_lambda = self.long_covid_weibull_lambda.at[agent_idx].set(450.0)
-                elif current_group == 1 and worsen_roll < 20:
-                    self.long_covid_recovery_group = self.long_covid_recovery_group.at[agent_idx].set(2)
-                    self.long_covid_weibull_k = self.long_covid_weibull_k.at[agent_idx].set(0.5)
-                    self.long_covid_weibull_lambda = self.long_covid_weibull_lambda.at[agent_idx].set(1200.0)
-            
-            self.symptomatic_duration = self.symptomatic_duration.at[agent_idx].set(symptom_duration)
-        
-        if not self.persistent_long_covid[agent_idx]:
-            self.long_covid_recovery_group = self.long_covid_recovery_group.at[agent_idx].set(-1)
-            self.long_covid_weibull_k = self.long_covid_weibull_k.at[agent_idx].set(0.0)
-            self.long_covid_weibull_lambda = self.long_covid_weibull_lambda.at[agent_idx].set(0.0)
+            self.state, acc, daily = run_days(self.state, acc, self.neighbors, params,
+                                              start_day, n_days=n_days, crn=crn)
+        return acc, daily
     
-    def run_simulation(self, verbose=True, save_timeseries=True):
-        """Run GPU simulation with LC tracking"""
+    def run_simulation(self, verbose=True, save_timeseries=True, checkpoint_every_days=None,
+                       checkpoint_path='checkpoint.npz'):
+        """Run GPU simulation with LC tracking
+        
+        With ``checkpoint_every_days`` the model is saved to ``checkpoint_path``
+        (see save_checkpoint) at the first chunk boundary after every that many
+        days. After load_checkpoint() the run continues from the saved day.
+        """
         if verbose:
             print(f"\n🚀 Starting simulation: {self.N:,} agents, {self.config['max_days']} days")
         
         start_time = time.time()
-        key = self.key
-        total_reinfected = 0
-        min_productivity = 100.0
+        params = step_params(self.config, self.N)
+        acc, first_day, timeseries_data = self._progress or (self._new_accumulators(), 0, [])
+        self._progress = None
+        if verbose and first_day > 0:
+            print(f"↻ Resuming from checkpoint at day {first_day}")
         
         # Time-series tracking
-        timeseries_data = [] if save_timeseries else None
+        # A run checkpointed without its timeseries resumes with days from here on
+        timeseries_data = (timeseries_data or []) if save_timeseries else None
+        last_checkpoint = first_day
         
-        for day in range(self.config['max_days']):
-            n_infected = int(jnp.sum(self.infected))
-            n_immune = int(jnp.sum(self.immuned))
-            n_lc = int(jnp.sum(self.persistent_long_covid))
-            productivity = self._calculate_productivity()
-            
-            # Save daily data
-            if save_timeseries:
-                timeseries_data.append({
-                    'day': day,
-                    'infected': n_infected,
-                    'immune': n_immune,
-                    'long_covid': n_lc,
-                    'productivity': productivity
-                })
-            
-            if verbose and day % 30 == 0:
-                print(f"Day {day:3d}: Inf={n_infected:4d}, Imm={n_immune:4d}, "
-                      f"LC={n_lc:4d}, Prod={productivity:.1f}%")
-            
-            if day == self.config['v_start_time']:
-                self._vaccination_status()
-            
-            if self.config['long_covid']:
-                self._do_long_covid_checks(day, key)
-                key, = random.split(key, 1)
-            
-            if self.config['long_covid']:
-                self._process_pending_lc(day)
-            
-            self._update_infected_agents(day, key)
-            key, = random.split(key, 1)
+        for start_day in range(first_day, self.config['max_days'], RUN_CHUNK_DAYS):
+            acc, daily = self._run_chunk(acc, params, start_day)
+            running, n_infected, n_immune, n_lc, productivity = (np.asarray(x) for x in daily)
             
-            daily_reinfections = self._transmission_step(day, key)
-            total_reinfected += daily_reinfections
-            key, = random.split(key, 1)
-            
-            self._update_immune_agents(day)
-            self._update_vaccination_time(key)
-            key, = random.split(key, 1)
-            
-            min_productivity = min(min_productivity, productivity)
+            for offset in np.flatnonzero(running):
+                day = start_day + int(offset)
+                
+                # Save daily data
+                if save_timeseries:
+                    timeseries_data.append({
+                        'day': day,
+                        'infected': int(n_infected[offset]),
+                        'immune': int(n_immune[offset]),
+                        'long_covid': int(n_lc[offset]),
+                        'productivity': float(productivity[offset])
+                    })
+                
+                if verbose and day % 30 == 0:
+                    print(f"Day {day:3d}: Inf={n_infected[offset]:4d}, Imm={n_immune[offset]:4d}, "
+                          f"LC={n_lc[offset]:4d}, Prod={productivity[offset]:.1f}%")
             
-            if not jnp.any(self.infected) and not jnp.any(self.immuned):
+            if not bool(acc.active):
                 if verbose:
-                    print(f"✓ Epidemic ended at day {day}")
+                    print(f"✓ Epidemic ended at day {int(acc.days_run) - 1}")
                 break
+            
+            next_day = start_day + RUN_CHUNK_DAYS
+            if checkpoint_every_days and next_day - last_checkpoint >= checkpoint_every_days:
+                self.key = acc.key
+                self._progress = (acc, next_day, timeseries_data)
+                self.save_checkpoint(checkpoint_path)
+                self._progress = None
+                last_checkpoint = next_day
+                if verbose:
+                    print(f"💾 Checkpoint at day {next_day}: {checkpoint_path}")
         
+        self.key = acc.key
         total_time = time.time() - start_time
-        n_infected_ever = int(jnp.sum(self.number_of_infection > 0))
+        n_infected_ever = int(jnp.sum(self.state.number_of_infection > 0))
         n_lc_total = int(jnp.sum(self.persistent_long_covid))
         
         if verbose:
             print(f"✓ Complete: {total_time:.1f}s, {n_infected_ever:,} infected, {n_lc_total:,} LC")
         
         results = {
-            'runtime_days': day + 1,
+            'runtime_days': int(acc.days_run),
             'infected': n_infected_ever,
-            'reinfected': total_reinfected,
+            'reinfected': int(acc.total_reinfected),
             'long_covid_cases': n_lc_total,
-            'min_productivity': min_productivity,
+            'min_productivity': float(acc.min_productivity),
+            **_curve_metrics(acc),
         }
         
         if save_timeseries:
@@ -392,333 +1194,301 @@ class FixedGPUABM:
         
         return results
     
-    def _update_infected_agents(self, day, key):
-        """Update infected agents AND check for LC onset"""
-        infected_mask = self.infected
-        infected_indices = jnp.where(infected_mask)[0]
-        
-        self.virus_check_timer = jnp.where(infected_mask, 
-                                          self.virus_check_timer + 1, 
-                                          self.virus_check_timer)
-        
-        for idx in infected_indices:
-            idx = int(idx)
-            timer = int(self.virus_check_timer[idx])
-            symp_start = int(self.symptomatic_start[idx])
-            symp_dur = int(self.symptomatic_duration[idx])
-            
-            if symp_start > 0 and timer >= symp_start and timer < symp_start + symp_dur:
-                self.symptomatic = self.symptomatic.at[idx].set(True)
-            else:
-                self.symptomatic = self.symptomatic.at[idx].set(False)
-            
-            if self.config['long_covid'] and not self.persistent_long_covid[idx]:
-                # Path A: ASYMPTOMATIC
-                if timer >= self.config['infected_period'] and symp_start == 0:
-                    key, subkey = random.split(key)
-                    p_onset = self._calculate_lc_onset_prob(idx, is_asymptomatic=True)
-                    if random.uniform(subkey) * 100 < p_onset:
-                        onset_day = int(self.infection_start_tick[idx]) + self.config['long_covid_time_threshold']
-                        self.lc_pending = self.lc_pending.at[idx].set(True)
-                        self.lc_onset_day = self.lc_onset_day.at[idx].set(onset_day)
-                
-                # Path B: SYMPTOMATIC > 30 days
-                if symp_start > 0 and symp_dur > self.config['long_covid_time_threshold']:
-                    if timer == symp_start + self.config['long_covid_time_threshold']:
-                        self._assign_long_covid_group(idx, key)
-                        key, = random.split(key, 1)
-                
-                # Path C: SYMPTOMATIC ≤ 30 days
-                if symp_start > 0 and symp_dur <= self.config['long_covid_time_threshold']:
-                    if timer == symp_start + symp_dur:
-                        key, subkey = random.split(key)
-                        p_onset = self._calculate_lc_onset_prob(idx, is_asymptomatic=False)
-                        if random.uniform(subkey) * 100 < p_onset:
-                            onset_day = int(self.infection_start_tick[idx]) + self.config['long_covid_time_threshold']
-                            self.lc_pending = self.lc_pending.at[idx].set(True)
-                            self.lc_onset_day = self.lc_onset_day.at[idx].set(onset_day)
-        
-        become_immune = infected_mask & (self.virus_check_timer >= self.config['infected_period'])
-        self.infected = self.infected & ~become_immune
-        self.immuned = self.immuned | become_immune
-        self.virus_check_timer = jnp.where(become_immune, 0, self.virus_check_timer)
-    
-    def _calculate_lc_onset_prob(self, agent_idx, is_asymptomatic):
-        """Calculate LC onset probability with all multipliers"""
-        base_prob = self.config['lc_onset_base_pct']
-        multiplier = 1.0
-        
-        age = int(self.age[agent_idx])
-        if age < 30:
-            multiplier *= 0.9
-        elif 50 <= age <= 64:
-            multiplier *= 1.2
-        elif age >= 65:
-            multiplier *= 1.3
-        
-        if int(self.gender[agent_idx]) == 1:
-            multiplier *= self.config['lc_incidence_mult_female']
-        
-        if self.vaccinated[agent_idx]:
-            multiplier *= 0.7
-        
-        n_infections = int(self.number_of_infection[agent_idx])
-        has_lc = int(self.long_covid_recovery_group[agent_idx]) >= 0
-        if n_infections > 1 and not has_lc:
-            multiplier *= self.config['reinfection_new_onset_mult']
-        
-        if is_asymptomatic:
-            multiplier *= self.config['asymptomatic_lc_mult']
-        
-        return jnp.clip(base_prob * multiplier, 0, 100)
-    
-    def _assign_long_covid_group(self, agent_idx, key):
-        """Assign LC recovery group and parameters"""
-        w_fast = self.config['lc_base_fast_prob']
-        w_pers = self.config['lc_base_persistent_prob']
-        w_sum = w_fast + w_pers
-        
-        if w_sum > 100:
-            w_fast = 100 * w_fast / w_sum
-            w_pers = 100 * w_pers / w_sum
-            w_sum = 100
-        w_grad = 100 - w_sum
-        
-        age = int(self.age[agent_idx])
-        if age >= 65 and w_grad >= 2:
-            w_pers += 2
-            w_grad -= 2
-        
-        symp_dur = int(self.symptomatic_duration[agent_idx])
-        if symp_dur > 21 and w_grad >= 4:
-            w_pers += 4
-            w_grad -= 4
-        
-        total = w_fast + w_pers + w_grad
-        if total <= 0:
-            w_grad = 100
-            total = 100
-        
-        key, subkey = random.split(key)
-        r = random.uniform(subkey) * total
-        
-        if r < w_fast:
-            group, k, lam = 0, 1.5, 60.0
-            severity = random.normal(key) * 15 + 30
-        elif r < w_fast + w_pers:
-            group, k, lam = 2, 0.5, 1200.0
-            severity = random.normal(key) * 20 + 70
-        else:
-            group, k, lam = 1, 1.2, 450.0
-            severity = random.normal(key) * 20 + 50
-        
-        severity = jnp.clip(severity, 5, 100)
-        
-        self.persistent_long_covid = self.persistent_long_covid.at[agent_idx].set(True)
-        self.long_covid_duration = self.long_covid_duration.at[agent_idx].set(0)
-        self.long_covid_recovery_group = self.long_covid_recovery_group.at[agent_idx].set(group)
-        self.long_covid_weibull_k = self.long_covid_weibull_k.at[agent_idx].set(k)
-        self.long_covid_weibull_lambda = self.long_covid_weibull_lambda.at[agent_idx].set(lam)
-        self.long_covid_severity = self.long_covid_severity.at[agent_idx].set(severity)
+    def save_checkpoint(self, path):
+        """Write the model to a compressed ``.npz`` at ``path``.
+        
+        Holds every agent array, the contact network, the PRNG key and config,
+        plus the accumulators and timeseries of a run in progress. The file is
+        replaced atomically, so a preempted job always finds a whole checkpoint.
+        """
+        arrays = {f'state_{name}': np.asarray(x) for name, x in zip(AgentState._fields, self.state)}
+        arrays['neighbors'] = np.asarray(self.neighbors)
+        arrays['key'] = np.asarray(self.key)
+        meta = {'N': self.N, 'N_padded': self.N_padded, 'bucket': self.bucket, 'config': self.config}
+        if self._progress is not None:
+            acc, meta['next_day'], meta['timeseries'] = self._progress
+            arrays.update({f'acc_{name}': np.asarray(x) for name, x in zip(RunAccumulators._fields, acc)})
+        arrays['meta'] = np.array(json.dumps(meta))
+        
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+        return path
     
-    def _process_pending_lc(self, day):
-        """Activate pending LC cases"""
-        pending_mask = self.lc_pending & (day >= self.lc_onset_day)
-        pending_indices = jnp.where(pending_mask)[0]
-        
-        key = self.key
-        for idx in pending_indices:
-            idx = int(idx)
-            self.lc_pending = self.lc_pending.at[idx].set(False)
+    def load_checkpoint(self, path):
+        """Restore a model written by save_checkpoint(); a checkpoint taken
+        mid-run makes the next run_simulation() continue that run"""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            self.N, self.N_padded, self.bucket = meta['N'], meta['N_padded'], meta['bucket']
+            self.config = meta['config']
+            self.sharding = None
+            self.state = AgentState(*(jnp.asarray(data[f'state_{name}']) for name in AgentState._fields))
+            self.neighbors = jnp.asarray(data['neighbors'])
+            self.key = jnp.asarray(data['key'])
             
-            if not self.persistent_long_covid[idx]:
-                key, subkey = random.split(key)
-                self._assign_long_covid_group(idx, subkey)
-        
-        self.key = key
+            self._progress = None
+            if 'next_day' in meta:
+                acc = RunAccumulators(*(jnp.asarray(data[f'acc_{name}']) for name in RunAccumulators._fields))
+                self._progress = (acc, meta['next_day'], meta['timeseries'])
+        return self
     
-    def _do_long_covid_checks(self, day, key):
-        """LC recovery with Weibull hazard"""
-        lc_mask = self.persistent_long_covid
-        lc_indices = jnp.where(lc_mask)[0]
-        
-        self.long_covid_duration = jnp.where(lc_mask, 
-                                             self.long_covid_duration + 1, 
-                                             self.long_covid_duration)
-        
-        for idx in lc_indices:
-            idx = int(idx)
-            duration = int(self.long_covid_duration[idx])
-            k = float(self.long_covid_weibull_k[idx])
-            lam = float(self.long_covid_weibull_lambda[idx])
-            group = int(self.long_covid_recovery_group[idx])
+    def fork_scenarios(self, scenarios, verbose=False, save_timeseries=False, independent_streams=False):
+        """Run vaccination scenarios that share their pre-vaccination history.
+        
+        Each scenario is a dict of FORK_KEYS overrides. Until its
+        ``v_start_time`` every scenario simulates the same days, so one trunk
+        run (without vaccination) is advanced once and each scenario is
+        forked from a copy of it on its start day. By default a fork keeps
+        the trunk's PRNG stream, which gives exactly the results of a full
+        run_simulation() under that scenario; ``independent_streams`` folds
+        the scenario index into each fork's key instead.
+        
+        Returns one run_simulation() results dict per scenario, in order.
+        """
+        for overrides in scenarios:
+            unforkable = set(overrides) - set(FORK_KEYS)
+            if unforkable:
+                raise ValueError(f"Scenario changes {sorted(unforkable)}, which affect days before "
+                                 f"vaccination; only {FORK_KEYS} can be forked")
+        
+        base_config = self.config
+        max_days = base_config['max_days']
+        fork_days = [min(int(overrides.get('v_start_time', base_config['v_start_time'])), max_days)
+                     for overrides in scenarios]
+        
+        # The trunk never vaccinates, so it stays valid for every scenario up to
+        # its start day. It runs on a copy so this model is left as it was.
+        trunk_model = copy.copy(self)
+        trunk_model.state, trunk_model.key = jax.tree_util.tree_map(jnp.copy, (self.state, self.key))
+        trunk_params = step_params({**base_config, 'v_start_time': -1}, self.N)
+        trunk = trunk_model._new_accumulators()
+        trunk_timeseries = []
+        day = 0
+        
+        all_results = [None] * len(scenarios)
+        for i in sorted(range(len(scenarios)), key=lambda i: fork_days[i]):
+            while day < fork_days[i]:
+                n_days = min(RUN_CHUNK_DAYS, fork_days[i] - day)
+                trunk, daily = trunk_model._run_chunk(trunk, trunk_params, day, n_days)
+                if save_timeseries:
+                    trunk_timeseries.extend(_timeseries_rows(day, daily))
+                day += n_days
             
-            if duration > 0 and k > 0 and lam > 0:
-                t_scaled = duration / lam
-                hazard = (k / lam) * (t_scaled ** (k - 1))
-                daily_prob = (1 - jnp.exp(-hazard)) * 100
-                
-                daily_prob = jnp.clip(daily_prob, 0.01, 10.0)
-                
-                if group == 0:
-                    daily_prob *= 2.0
-                elif group == 2:
-                    daily_prob *= 0.3
-                    if duration > 1095:
-                        daily_prob *= 0.1
-                
-                daily_prob = jnp.clip(daily_prob, 0, 15)
-                
-                key, subkey = random.split(key)
-                if random.uniform(subkey) * 100 < daily_prob:
-                    self.persistent_long_covid = self.persistent_long_covid.at[idx].set(False)
-                    self.long_covid_severity = self.long_covid_severity.at[idx].set(0.0)
-                    self.long_covid_duration = self.long_covid_duration.at[idx].set(0)
-                    self.long_covid_recovery_group = self.long_covid_recovery_group.at[idx].set(-1)
-                    self.long_covid_weibull_k = self.long_covid_weibull_k.at[idx].set(0.0)
-                    self.long_covid_weibull_lambda = self.long_covid_weibull_lambda.at[idx].set(0.0)
-                else:
-                    if group == 1 and duration > 30:
-                        new_severity = float(self.long_covid_severity[idx]) - 0.05
-                        new_severity = jnp.clip(new_severity, 5, 100)
-                        self.long_covid_severity = self.long_covid_severity.at[idx].set(new_severity)
-    
-    def _update_immune_agents(self, day):
-        """Update immune agents"""
-        immune_mask = self.immuned
-        
-        self.virus_check_timer = jnp.where(immune_mask, 
-                                          self.virus_check_timer + 1, 
-                                          self.virus_check_timer)
-        
-        immunity_end = self.config['infected_period'] + self.config['immune_period']
-        lose_immunity = immune_mask & (self.virus_check_timer >= immunity_end)
-        
-        self.immuned = self.immuned & ~lose_immunity
-        self.virus_check_timer = jnp.where(lose_immunity, 0, self.virus_check_timer)
-    
-    def _transmission_step(self, day, key):
-        """Transmission with precaution behavior"""
-        daily_reinfections = 0
-        
-        infectious_mask = (self.infected & 
-                          (self.virus_check_timer >= self.infectious_start) & 
-                          (self.virus_check_timer < self.infectious_end))
-        
-        infectious_indices = jnp.where(infectious_mask)[0]
-        
-        for source_idx in infectious_indices:
-            source_idx = int(source_idx)
-            
-            if self.symptomatic[source_idx]:
-                symp_start = int(self.symptomatic_start[source_idx])
-                timer = int(self.virus_check_timer[source_idx])
-                
-                if symp_start > 0 and timer > symp_start:
-                    key, subkey = random.split(key)
-                    if random.uniform(subkey) * 100 < self.config['precaution_pct']:
-                        continue
-            
-            source_neighbors = self.neighbors[source_idx]
-            valid_neighbors = source_neighbors[source_neighbors != -1]
-            
-            for neighbor_idx in valid_neighbors:
-                neighbor_idx = int(neighbor_idx)
-                
-                if neighbor_idx >= self.N:
-                    continue
-                
-                if (self.infected[neighbor_idx] or 
-                    self.immuned[neighbor_idx] or 
-                    self.super_immune[neighbor_idx]):
-                    continue
-                
-                if self.vaccinated[neighbor_idx]:
-                    if self.config['vaccination_decay']:
-                        eff = max(0, self.config['efficiency_pct'] - 0.11 * float(self.vaccinated_time[neighbor_idx]))
-                    else:
-                        eff = self.config['efficiency_pct']
-                    
-                    key, subkey = random.split(key)
-                    if random.uniform(subkey) * 100 < eff:
-                        continue
-                
-                infection_prob = self.config['covid_spread_chance_pct']
-                
-                covid_age = float(self.covid_age_prob[neighbor_idx])
-                us_age = float(self.us_age_prob[neighbor_idx])
-                infection_prob *= covid_age / (us_age + 1e-9)
-                
-                infection_prob = jnp.clip(infection_prob, 0, 100)
-                
-                key, subkey = random.split(key)
-                if random.uniform(subkey) * 100 < infection_prob:
-                    if self.number_of_infection[neighbor_idx] > 0:
-                        daily_reinfections += 1
-                    
-                    key, subkey = random.split(key)
-                    self._infect_agent_with_symptoms(neighbor_idx, day, subkey)
-        
-        return daily_reinfections
-    
-    def _vaccination_status(self):
-        """Simple vaccination"""
-        current_vaccinated = jnp.sum(self.vaccinated)
-        target_vaccinated = int(self.N * self.config['vaccination_pct'] / 100)
-        
-        if current_vaccinated >= target_vaccinated:
-            return
-        
-        unvaccinated_mask = ~self.vaccinated
-        unvaccinated_indices = jnp.where(unvaccinated_mask)[0]
-        
-        n_to_vaccinate = min(target_vaccinated - int(current_vaccinated), len(unvaccinated_indices))
-        
-        if n_to_vaccinate > 0:
-            key, subkey = random.split(self.key)
-            vaccinate_indices = random.choice(subkey, unvaccinated_indices, 
-                                            shape=(n_to_vaccinate,), replace=False)
-            
-            self.vaccinated = self.vaccinated.at[vaccinate_indices].set(True)
-            self.vaccinated_time = self.vaccinated_time.at[vaccinate_indices].set(1)
-            self.key = subkey
-    
-    def _update_vaccination_time(self, key):
-        """Update vaccination time and boosters"""
-        vaccinated_mask = self.vaccinated
-        self.vaccinated_time = jnp.where(vaccinated_mask, 
-                                        self.vaccinated_time + 1, 
-                                        self.vaccinated_time)
-        
-        need_booster = vaccinated_mask & (self.vaccinated_time >= 180)
-        booster_indices = jnp.where(need_booster)[0]
-        
-        if len(booster_indices) > 0:
-            key, subkey = random.split(key)
-            booster_probs = random.uniform(subkey, (len(booster_indices),))
-            get_booster = booster_probs * 100 < self.config['boosted_pct']
-            
-            for i, idx in enumerate(booster_indices):
-                idx = int(idx)
-                if get_booster[i]:
-                    self.vaccinated_time = self.vaccinated_time.at[idx].set(1)
-                else:
-                    self.vaccinated = self.vaccinated.at[idx].set(False)
-                    self.vaccinated_time = self.vaccinated_time.at[idx].set(0)
+            fork = copy.copy(self)
+            fork.config = {**base_config, **scenarios[i]}
+            fork.state, acc = jax.tree_util.tree_map(jnp.copy, (trunk_model.state, trunk))
+            if independent_streams:
+                acc = acc._replace(key=random.fold_in(acc.key, i))
+            fork._progress = (acc, day, list(trunk_timeseries))
+            all_results[i] = fork.run_simulation(verbose=verbose, save_timeseries=save_timeseries)
+        
+        return all_results
     
     def _calculate_productivity(self):
         """Calculate current productivity"""
-        symptomatic_loss = float(jnp.sum(self.symptomatic))
-        
-        lc_loss = float(jnp.sum(jnp.where(
-            self.persistent_long_covid & ~self.symptomatic,
-            self.long_covid_severity / 100.0,
-            0.0
-        )))
-        
-        total_loss = symptomatic_loss + lc_loss
-        productivity = (1 - total_loss / self.N) * 100
-        return float(productivity)
+        return float(_calculate_productivity(self.state, step_params(self.config, self.N)))
+    
+    def device_memory_profile(self, n_days=None):
+        """Live device bytes after each compiled chunk of days.
+        
+        The profile should stay flat once the first chunk has compiled. Live
+        bytes alone do not show donation (undonated inputs are simply freed
+        once dropped); see releases_donated_buffers().
+        """
+        n_days = n_days or self.config['max_days']
+        params = step_params(self.config, self.N)
+        acc = self._new_accumulators()
+        profile = []
+        for start_day in range(0, n_days, RUN_CHUNK_DAYS):
+            acc, daily = self._run_chunk(acc, params, start_day)
+            jax.block_until_ready(self.state)
+            del daily
+            gc.collect()
+            profile.append(live_device_bytes())
+        self.key = acc.key
+        return profile
+    
+    def releases_donated_buffers(self):
+        """Whether a compiled chunk consumes the agent and accumulator
+        buffers it is given (run on a copy, so this model is unchanged)"""
+        model = copy.copy(self)
+        model.state = jax.tree_util.tree_map(jnp.copy, self.state)
+        inputs = (model.state, model._new_accumulators())
+        acc, daily = model._run_chunk(inputs[1], step_params(self.config, self.N), 0)
+        jax.block_until_ready(model.state)
+        return all(x.is_deleted() for x in jax.tree_util.tree_leaves(inputs))
+
+
+# ========== REPLICATE BATCHES ==========
+# Simulations that share a contact network (same N, avg_degree and bucket) can
+# run as one batch: their states, accumulators and step params are stacked
+# along a leading replicate axis and advanced together by a vmapped run
+# function. With several devices (e.g. --xla_force_host_platform_device_count
+# on CPU) the replicate axis is split across them with shard_map, so every
+# device runs the same per-replicate program on its slice of the batch.
+
+REPLICATE_AXIS = 'replicate'
+BATCH_AXIS = 'batch'  # The vmapped axis within one device
+
+
+def _run_days_batched(states, accs, neighbors, p, start_day, n_days, crn=False):
+    run = partial(_run_days, n_days=n_days, crn=crn, batch_axis=BATCH_AXIS)
+    return jax.vmap(run, in_axes=(0, 0, None, 0, None), axis_name=BATCH_AXIS)(states, accs, neighbors, p, start_day)
+
+
+run_days_batched = jax.jit(_run_days_batched, static_argnames=('n_days', 'crn'), donate_argnums=(0, 1))
+
+# Sharded run functions, keyed by device tuple
+_sharded_runs = {}
+
+
+def _sharded_run_days(devices):
+    """run_days_batched with the replicate axis split over ``devices``"""
+    if devices not in _sharded_runs:
+        mesh = Mesh(np.array(devices), (REPLICATE_AXIS,))
+        batch, shared = PartitionSpec(REPLICATE_AXIS), PartitionSpec()
+        
+        def run(states, accs, neighbors, p, start_day, n_days, crn=False):
+            local = partial(_run_days_batched, n_days=n_days, crn=crn)
+            return shard_map(local, mesh=mesh,
+                             in_specs=(batch, batch, shared, batch, shared),
+                             out_specs=(batch, batch, batch), **_SHARD_MAP_UNCHECKED)(states, accs, neighbors, p, start_day)
+        
+        _sharded_runs[devices] = (mesh, jax.jit(run, static_argnames=('n_days', 'crn'), donate_argnums=(0, 1)))
+    return _sharded_runs[devices]
+
+
+def run_replicates(seeds, N=10000, bucket=None, save_timeseries=False, devices=None, **kwargs):
+    """Run one configuration once per seed as a single batch.
+    
+    Replicates are spread across ``devices`` (default: all of them); each
+    replicate's results match the single-device batch exactly. Returns one
+    run_simulation()-style results dict per seed, in order.
+    """
+    seeds = list(seeds)
+    return run_batch([kwargs] * len(seeds), seeds, N=N, bucket=bucket,
+                     save_timeseries=save_timeseries, devices=devices)
+
+
+def run_batch(configs, seeds, N=10000, bucket=None, save_timeseries=False, devices=None,
+              screen_days=None, takeoff_threshold=0):
+    """Run simulation ``i`` with ``configs[i]`` overrides and ``seeds[i]``,
+    all as one batch (see run_replicates).
+    
+    Every config must give the same avg_degree, since the batch shares one
+    contact network, and the same common_random_numbers, which selects the
+    compiled run. Returns one results dict per simulation, in order.
+    
+    With ``screen_days`` the batch first runs only that many days. Simulations
+    whose cumulative infections are still at most ``takeoff_threshold`` stop
+    there (early extinctions, reported with ``took_off`` False); the batch is
+    compacted to the rest, which continue to the end with ``took_off`` True.
+    """
+    devices = tuple(devices or jax.devices())
+    n_dev = len(devices)
+    
+    models = [initialized_model(config, N, seed, bucket) for config, seed in zip(configs, seeds)]
+    neighbors = models[0].neighbors
+    if any(m.config['avg_degree'] != models[0].config['avg_degree'] for m in models):
+        raise ValueError("A batch must share one contact network (same avg_degree)")
+    crn = bool(models[0].config['common_random_numbers'])
+    if any(bool(m.config['common_random_numbers']) != crn for m in models):
+        raise ValueError("A batch must share one common_random_numbers setting")
+    
+    max_days = max(m.config['max_days'] for m in models)
+    stack = lambda *x: jnp.stack(x)
+    params = jax.tree_util.tree_map(stack, *(step_params(m.config, N) for m in models))
+    states = jax.tree_util.tree_map(stack, *(m.state for m in models))
+    accs = jax.tree_util.tree_map(stack, *(m._new_accumulators() for m in models))
+    del models
+    
+    if n_dev > 1:
+        mesh, run = _sharded_run_days(devices)
+        batched = NamedSharding(mesh, PartitionSpec(REPLICATE_AXIS))
+        neighbors = jax.device_put(neighbors, NamedSharding(mesh, PartitionSpec()))
+    else:
+        run, batched = run_days_batched, None
+    
+    def select(keep, width=None):
+        """Batch positions ``keep`` and their simulation indices, padded with
+        copies of the last one to ``width`` (default: a multiple of the
+        device count)"""
+        width = width or len(keep) + -len(keep) % n_dev
+        keep = np.concatenate([keep, np.repeat(keep[-1:], width - len(keep))])
+        picked = jax.tree_util.tree_map(lambda x: x[keep], (states, accs, params))
+        return rows[keep], (picked if batched is None else jax.device_put(picked, batched))
+    
+    all_results = [None] * len(seeds)
+    daily_chunks = []
+    
+    def finish(rows, states, accs, positions=None, **extra):
+        """Fill in the results of the simulations in batch ``rows`` (only
+        those at batch ``positions``, default all)"""
+        n_infected_ever = np.asarray(jnp.sum(states.number_of_infection > 0, axis=1))
+        n_lc_total = np.asarray(jnp.sum(has_flag(states.flags, PERSISTENT_LONG_COVID), axis=1))
+        days_run = np.asarray(accs.days_run)
+        total_reinfected = np.asarray(accs.total_reinfected)
+        min_productivity = np.asarray(accs.min_productivity)
+        host_accs = jax.tree_util.tree_map(np.asarray, accs)
+        
+        for i in range(len(rows)) if positions is None else positions:
+            r = rows[i]
+            if all_results[r] is not None:
+                continue
+            results = {
+                'runtime_days': int(days_run[i]),
+                'infected': int(n_infected_ever[i]),
+                'reinfected': int(total_reinfected[i]),
+                'long_covid_cases': int(n_lc_total[i]),
+                'min_productivity': float(min_productivity[i]),
+                **_curve_metrics(jax.tree_util.tree_map(lambda x: x[i], host_accs)),
+                **extra,
+            }
+            if save_timeseries:
+                results['timeseries'] = [
+                    {
+                        'day': start_day + int(offset),
+                        'infected': int(n_infected[j, offset]),
+                        'immune': int(n_immune[j, offset]),
+                        'long_covid': int(n_lc[j, offset]),
+                        'productivity': float(productivity[j, offset])
+                    }
+                    for start_day, chunk_rows, (running, n_infected, n_immune, n_lc, productivity) in daily_chunks
+                    for j in np.flatnonzero(chunk_rows == r)[:1]
+                    for offset in np.flatnonzero(running[j])
+                ]
+            all_results[r] = results
+    
+    rows = np.arange(len(seeds))
+    rows, (states, accs, params) = select(rows)
+    start_day, extra = 0, {}
+    if screen_days:
+        screen_days = min(screen_days, max_days)
+        states, accs, daily = run(states, accs, neighbors, params, 0, n_days=screen_days, crn=crn)
+        if save_timeseries:
+            daily_chunks.append((0, rows, [np.asarray(x) for x in daily]))
+        
+        took_off = np.asarray(jnp.sum(states.number_of_infection > 0, axis=1)) > takeoff_threshold
+        finish(rows, states, accs, np.flatnonzero(~took_off), took_off=False)
+        start_day, extra = screen_days, {'took_off': True}
+        if not took_off.any():
+            return all_results
+        # Survivors are padded to a power-of-two batch (capped at the full
+        # one) so each survivor count does not compile its own executable
+        width = min(len(rows), n_dev * 2 ** math.ceil(math.log2(math.ceil(took_off.sum() / n_dev))))
+        rows, (states, accs, params) = select(np.flatnonzero(took_off), width)
+    
+    for start_day in range(start_day, max_days, RUN_CHUNK_DAYS):
+        if not np.any(np.asarray(accs.active)):
+            break
+        states, accs, daily = run(states, accs, neighbors, params, start_day, n_days=RUN_CHUNK_DAYS, crn=crn)
+        if save_timeseries:
+            daily_chunks.append((start_day, rows, [np.asarray(x) for x in daily]))
+    
+    finish(rows, states, accs, **extra)
+    return all_results
 
 
 # ========== PARAMETER SWEEP ==========
@@ -750,22 +1520,610 @@ LABELS = {
 }
 
 
-def run_gpu_sweep(n_runs=10, N=100000, output_file="gpu_sweep_results.csv", save_timeseries=True):
-    """Run parameter sweep on GPU with per-run checkpointing"""
+# ----- Sweep executor -----
+# Each (param, value, seed) simulation is independent, so sweeps fan tasks out
+# to a pool of worker processes. Workers are spawned (not forked), so JAX is
+# initialised fresh in each one after its XLA thread flags are set.
+
+class SweepTask(NamedTuple):
+    param_name: str
+    param_value: float
+    run: int
+    seed: int
+    config: dict  # Overrides applied to the default config
+    N: int
+    bucket: str = None
+    save_timeseries: bool = False
+
+
+def _init_sweep_worker(threads, slots, cache_dir):
+    """Pin this worker to its own cores and threads before JAX starts"""
+    with slots.get_lock():
+        slot = slots.value
+        slots.value += 1
+    
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+        if len(cores) >= (slot + 1) * threads:
+            os.sched_setaffinity(0, cores[slot * threads:(slot + 1) * threads])
+    
+    # XLA has no flag for its CPU thread count: it sizes its pools from the
+    # schedulable cores, so the affinity pin above is what sets the limit
+    eigen = 'true' if threads > 1 else 'false'
+    os.environ['XLA_FLAGS'] = f"{os.environ.get('XLA_FLAGS', '')} --xla_cpu_multi_thread_eigen={eigen}".strip()
+    # Workers share one accelerator, so none of them may grab most of its memory
+    os.environ.setdefault('XLA_PYTHON_CLIENT_PREALLOCATE', 'false')
+    enable_compilation_cache(cache_dir)
+
+
+# ----- Initial state reuse -----
+# Sweep variants that only change dynamics-only parameters start from the same
+# initial state, so each process keeps recently built states (and contact
+# networks, which depend only on N, avg_degree and bucket) and copies them
+# instead of initializing again.
+
+INIT_CACHE_SIZE = 8
+_init_cache = OrderedDict()     # (N, bucket, seed, INIT_KEYS values) -> (state, neighbors, key, N_padded)
+_network_cache = OrderedDict()  # (N, bucket, avg_degree) -> neighbors
+
+
+def _cache_put(cache, key, value):
+    cache[key] = value
+    while len(cache) > INIT_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def initialized_model(config, N, seed, bucket=None):
+    """FixedGPUABM initialized with ``config`` overrides, reusing the initial
+    state of an earlier model with the same N, bucket, seed and INIT_KEYS"""
+    abm = FixedGPUABM()
+    abm.config.update({k: v for k, v in config.items() if k in abm.config})
+    
+    init_key = (N, bucket, seed, tuple(abm.config[k] for k in INIT_KEYS))
+    cached = _init_cache.get(init_key)
+    if cached is None:
+        network_key = (N, bucket, abm.config['avg_degree'])
+        abm.initialize_simulation(N=N, seed=seed, bucket=bucket, neighbors=_network_cache.get(network_key))
+        _cache_put(_network_cache, network_key, abm.neighbors)
+        # Copies: the model's own state and key are donated once it runs
+        cached = jax.tree_util.tree_map(jnp.copy, (abm.state, abm.key))
+        _cache_put(_init_cache, init_key, (cached[0], abm.neighbors, cached[1], abm.N_padded))
+        return abm
+    
+    _init_cache.move_to_end(init_key)
+    state, neighbors, key, abm.N_padded = cached
+    abm.N, abm.bucket = N, bucket
+    abm.state, abm.key = jax.tree_util.tree_map(jnp.copy, (state, key))
+    abm.neighbors = neighbors
+    return abm
+
+
+def run_sweep_task(task):
+    """Run one sweep simulation; returns the run_simulation() results"""
+    abm = initialized_model(task.config, task.N, task.seed, task.bucket)
+    results = abm.run_simulation(verbose=False, save_timeseries=task.save_timeseries)
+    results['backend'] = jax.default_backend()
+    return results
+
+
+def run_sweep_group(tasks):
+    """Run tasks that differ only in FORK_KEYS from one shared prefix
+    (see FixedGPUABM.fork_scenarios); returns their results in order"""
+    if len(tasks) == 1:
+        return [run_sweep_task(tasks[0])]
+    
+    first = tasks[0]
+    shared = {k: v for k, v in first.config.items() if k not in FORK_KEYS}
+    abm = initialized_model(shared, first.N, first.seed, first.bucket)
+    scenarios = [{k: v for k, v in task.config.items() if k in FORK_KEYS} for task in tasks]
+    all_results = abm.fork_scenarios(scenarios, save_timeseries=first.save_timeseries)
+    for results in all_results:
+        results['backend'] = jax.default_backend()
+    return all_results
+
+
+def _fork_groups(tasks):
+    """Group tasks whose runs share everything up to vaccination"""
+    groups = {}
+    for task in tasks:
+        shared = tuple(sorted((k, v) for k, v in task.config.items() if k not in FORK_KEYS))
+        groups.setdefault((task.seed, task.N, task.bucket, task.save_timeseries, shared), []).append(task)
+    return list(groups.values())
+
+
+def _run_sweep_group_safely(tasks):
+    try:
+        return [(task, results, None) for task, results in zip(tasks, run_sweep_group(tasks))]
+    except Exception as e:
+        return [(task, None, f"{type(e).__name__}: {e}") for task in tasks]
+
+
+def _sweep_jobs(groups, n_workers):
+    """Bundle fork groups that share an initial state into one job each (so
+    one process initializes once), splitting bundles while there are fewer
+    jobs than workers"""
+    jobs = {}
+    for group in groups:
+        task = group[0]
+        init = tuple(task.config.get(k) for k in INIT_KEYS)
+        jobs.setdefault((task.seed, task.N, task.bucket, init), []).append(group)
+    jobs = list(jobs.values())
+    
+    while jobs and len(jobs) < n_workers:
+        largest = max(jobs, key=len)
+        if len(largest) < 2:
+            break
+        jobs.remove(largest)
+        jobs += [largest[:len(largest) // 2], largest[len(largest) // 2:]]
+    return jobs
+
+
+def _run_sweep_job_safely(groups):
+    return [item for group in groups for item in _run_sweep_group_safely(group)]
+
+
+def _canonical_value(v):
+    if isinstance(v, (int, float, np.number)) and not isinstance(v, bool):
+        return float(v)
+    return v
+
+
+def plan_sweep(tasks):
+    """Map each distinct simulation to every task that needs its result.
+    
+    Tasks are canonicalized to their full effective config (defaults plus
+    overrides, numbers as floats), N, bucket and seed, so a configuration
+    that appears in several one-at-a-time ranges (the baseline value of each
+    swept parameter) is simulated once. Returns ``{key: [tasks]}`` in task
+    order; the first task of each list is the one that is run.
+    """
+    defaults = FixedGPUABM().config
+    plan = {}
+    for task in tasks:
+        plan.setdefault(_plan_key(task, defaults), []).append(task)
+    return plan
+
+
+def _plan_key(task, defaults):
+    config = {**defaults, **{k: v for k, v in task.config.items() if k in defaults}}
+    return json.dumps([{k: _canonical_value(v) for k, v in config.items()},
+                       task.N, task.bucket, task.seed, task.save_timeseries], sort_keys=True)
+
+
+def iter_sweep_results(tasks, n_workers=1, threads_per_worker=1, cache_dir=None, result_cache=None):
+    """Run sweep tasks, yielding ``(task, results, error)`` as each finishes.
+    
+    Each distinct simulation is run once and its results are yielded for
+    every task that needs it (see plan_sweep). Tasks that differ only in
+    vaccination settings are run as one forked
+    group (see run_sweep_group), and groups sharing an initial state are run
+    by the same process (see initialized_model). With ``n_workers=1`` they
+    run in this process. Otherwise they are spread over ``n_workers`` spawned
+    processes with ``threads_per_worker`` XLA threads each and yielded in
+    completion order. ``error`` is a message (and ``results`` None) when a
+    simulation raised. Tasks found in ``result_cache`` (a ResultCache) are
+    yielded first without running, and new results are added to it.
+    """
+    if result_cache is not None:
+        misses = []
+        for task in tasks:
+            results = result_cache.get(task.config, task.N, task.seed, task.bucket, task.save_timeseries)
+            if results is None:
+                misses.append(task)
+            else:
+                yield task, results, None
+        tasks = misses
+    
+    plan = plan_sweep(tasks)
+    defaults = FixedGPUABM().config
+    
+    def fan_out(items):
+        for run_task, results, error in items:
+            if result_cache is not None and error is None:
+                result_cache.put(run_task.config, run_task.N, run_task.seed, run_task.bucket, results)
+            for task in plan[_plan_key(run_task, defaults)]:
+                yield task, copy.deepcopy(results), error
+    
+    jobs = _sweep_jobs(_fork_groups([copies[0] for copies in plan.values()]), n_workers)
+    if n_workers <= 1:
+        for job in jobs:
+            yield from fan_out(_run_sweep_job_safely(job))
+        return
+    
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    
+    ctx = multiprocessing.get_context('spawn')
+    slots = ctx.Value('i', 0)
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx, initializer=_init_sweep_worker,
+                             initargs=(threads_per_worker, slots, cache_dir)) as pool:
+        futures = [pool.submit(_run_sweep_job_safely, job) for job in jobs]
+        for future in as_completed(futures):
+            yield from fan_out(future.result())
+
+
+# ----- Task ledger -----
+# Completed tasks are recorded in an append-only JSON-lines file next to the
+# results, keyed by a hash of the task's configuration (with the engine
+# version and whether timeseries are saved) plus its seed, so a restarted
+# sweep only runs the tasks that are missing and never reuses rows from
+# another engine version or rows without their timeseries.
+
+def _json_scalar(x):
+    return x.item()  # numpy scalars
+
+
+def task_key(task):
+    """Stable identity of a sweep task: config hash + seed"""
+    spec = json.dumps({'config': task.config, 'N': task.N, 'bucket': task.bucket,
+                       'save_timeseries': task.save_timeseries, 'engine': engine_version()},
+                      sort_keys=True, default=_json_scalar)
+    return f"{hashlib.sha256(spec.encode()).hexdigest()[:16]}-{task.seed}"
+
+
+def ledger_path(output_file):
+    return os.path.splitext(output_file)[0] + '_ledger.jsonl'
+
+
+class SweepLedger:
+    """Append-only record of completed sweep tasks and their result rows.
+    
+    Each entry is one line written with a single write() on an O_APPEND
+    descriptor and fsynced, so a crash can at most leave a torn last line,
+    which is dropped when the ledger is reopened. Without ``keep_rows`` only
+    the task keys are held in memory (row() is then unavailable).
+    """
+    
+    def __init__(self, path, keep_rows=True):
+        self.path = path
+        self.keep_rows = keep_rows
+        self.rows = {}
+        self.parts = set()  # ResultSink parts holding the tasks' timeseries
+        if not os.path.exists(path):
+            return
+        
+        with open(path, 'rb') as f:
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) < len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(len(complete))
+        for line in complete.splitlines():
+            entry = json.loads(line)
+            self.rows[entry['key']] = entry['row'] if keep_rows else None
+            if 'part' in entry:
+                self.parts.add(entry['part'])
+    
+    def __contains__(self, task):
+        return task_key(task) in self.rows
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def row(self, task):
+        return self.rows[task_key(task)]
+    
+    def record(self, task, row, part=None):
+        self.record_many([(task, row)], part)
+    
+    def record_many(self, entries, part=None):
+        """Record ``(task, row)`` pairs with one append (``part``: the
+        ResultSink part holding their timeseries)"""
+        lines = []
+        for task, row in entries:
+            entry = {'key': task_key(task), 'row': row}
+            if part is not None:
+                entry['part'] = part
+            lines.append(json.dumps(entry, default=_json_scalar) + '\n')
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, ''.join(lines).encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        for task, row in entries:
+            self.rows[task_key(task)] = row if self.keep_rows else None
+        if part is not None:
+            self.parts.add(part)
+
+
+def write_csv_atomic(df, output_file):
+    """Replace ``output_file`` with ``df`` without ever leaving it half-written
+    (as Parquet if it ends in .parquet)"""
+    tmp_file = f"{output_file}.tmp"
+    if output_file.endswith('.parquet'):
+        df.to_parquet(tmp_file, index=False)
+    else:
+        df.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, output_file)
+
+
+# ----- Result sink -----
+# Sweep results are buffered and written in batches: timeseries as Parquet
+# files in one dataset partitioned by parameter, summaries as one table. A
+# flush first writes the timeseries files (each renamed into place once
+# complete), then commits its tasks to the ledger; on reopening, files of
+# flushes that never reached the ledger are removed, so a crash can only
+# lose the unflushed buffer.
+
+FLUSH_ROWS = 256  # Results buffered before a flush
+FLUSH_SECONDS = 60  # ... or seconds since the last flush
+
+TIMESERIES_PARTITIONS = ('param_name', 'param_value')
+
+
+def timeseries_path(output_file):
+    return os.path.splitext(output_file)[0] + '_timeseries'
+
+
+def rows_path(output_file):
+    return os.path.splitext(output_file)[0] + '_rows'
+
+
+def read_timeseries(output_file, **filters):
+    """Timeseries of a sweep as one DataFrame, e.g.
+    ``read_timeseries('gpu_sweep_results.csv', param_name='precaution_pct')``"""
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(timeseries_path(output_file), format='parquet', partitioning='hive')
+    condition = None
+    for name, value in filters.items():
+        term = ds.field(name) == value
+        condition = term if condition is None else condition & term
+    return dataset.to_table(filter=condition).to_pandas()
+
+
+class ResultSink:
+    """Buffered writer for sweep results (see the notes above).
+    
+    ``rows`` are the summary rows already committed (from the ledger). A CSV
+    ``output_file`` is rewritten from them once, then each flush appends its
+    rows, so it always holds every committed row in ``columns`` order (a
+    torn append is repaired on reopening). A Parquet ``output_file`` cannot
+    be appended to and is written by close().
+    
+    With ``stream`` no rows are kept in memory: each flush writes its summary
+    rows as one more Parquet file in ``<output>_rows/`` (committed like the
+    timeseries; read them back with iter_rows()), and close() assembles
+    ``output_file`` from those files. ``on_flush(part)`` is called after each
+    flush is committed.
+    """
+    
+    def __init__(self, output_file, ledger, columns, rows=(), flush_rows=FLUSH_ROWS,
+                 flush_seconds=FLUSH_SECONDS, stream=False, on_flush=None):
+        self.output_file = output_file
+        self.timeseries_dir = timeseries_path(output_file)
+        self.rows_dir = rows_path(output_file)
+        self.ledger = ledger
+        self.columns = columns
+        self.rows = list(rows)
+        self.stream = stream
+        self.on_flush = on_flush
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.pending = []
+        self.last_flush = time.time()
+        self._remove_uncommitted_parts()
+        if not stream and not output_file.endswith('.parquet'):
+            import pandas as pd
+            write_csv_atomic(pd.DataFrame(self.rows, columns=columns), output_file)
+            self.rows = []
+    
+    def _remove_uncommitted_parts(self):
+        for directory in (self.timeseries_dir, self.rows_dir):
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    part = name.split('.')[0].replace('part-', '')
+                    if name.startswith('.') or part not in self.ledger.parts:
+                        os.remove(os.path.join(root, name))
+    
+    def _row_parts(self):
+        """Committed summary row files, oldest first"""
+        if not os.path.isdir(self.rows_dir):
+            return []
+        return sorted(os.path.join(self.rows_dir, name) for name in os.listdir(self.rows_dir)
+                      if name.startswith('part-'))
+    
+    def iter_rows(self, after=None):
+        """Committed summary rows (stream mode), one DataFrame per flush
+        (only flushes later than part ``after``)"""
+        import pandas as pd
+        for path in self._row_parts():
+            if after is None or os.path.basename(path).split('.')[0] > f"part-{after}":
+                yield pd.read_parquet(path)
+    
+    def add(self, task, row, timeseries=None):
+        self.pending.append((task, row, timeseries))
+        if (len(self.pending) >= self.flush_rows or
+                time.time() - self.last_flush >= self.flush_seconds):
+            self.flush()
+    
+    def flush(self):
+        import pandas as pd
+        
+        self.last_flush = time.time()
+        if not self.pending:
+            return
+        # Hex time prefix: part names sort in commit order
+        part = f"{time.time_ns():016x}{os.urandom(4).hex()}"
+        frames = []
+        for task, row, timeseries in self.pending:
+            if timeseries:
+                ts_df = pd.DataFrame(timeseries)
+                ts_df['run'] = task.run
+                ts_df['param_name'] = task.param_name
+                ts_df['param_value'] = task.param_value
+                frames.append(ts_df)
+        if frames:
+            self._write_timeseries(pd.concat(frames, ignore_index=True), part)
+        rows = [row for _, row, _ in self.pending]
+        if self.stream:
+            os.makedirs(self.rows_dir, exist_ok=True)
+            path = os.path.join(self.rows_dir, f"part-{part}.parquet")
+            tmp_path = os.path.join(self.rows_dir, f".part-{part}.parquet.tmp")
+            pd.DataFrame(rows, columns=self.columns).to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        
+        self.ledger.record_many([(task, row) for task, row, _ in self.pending],
+                                part if frames or self.stream else None)
+        self.pending = []
+        if not self.stream and self.output_file.endswith('.parquet'):
+            self.rows.extend(rows)
+        elif not self.stream:
+            pd.DataFrame(rows, columns=self.columns).to_csv(self.output_file, mode='a', header=False,
+                                                            index=False)
+        if self.on_flush is not None:
+            self.on_flush(part)
+    
+    def _write_timeseries(self, df, part):
+        for (param_name, param_value), group in df.groupby(list(TIMESERIES_PARTITIONS), sort=False):
+            directory = os.path.join(self.timeseries_dir, f"param_name={param_name}",
+                                     f"param_value={param_value}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{part}.parquet")
+            tmp_path = os.path.join(directory, f".part-{part}.parquet.tmp")
+            group.drop(columns=list(TIMESERIES_PARTITIONS)).to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+    
+    def close(self):
+        import pandas as pd
+        
+        self.flush()
+        if not self.stream:
+            if self.output_file.endswith('.parquet'):
+                write_csv_atomic(pd.DataFrame(self.rows, columns=self.columns), self.output_file)
+        elif self.output_file.endswith('.parquet'):
+            parts = list(self.iter_rows())
+            write_csv_atomic(pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=self.columns),
+                             self.output_file)
+        else:
+            # One flush file at a time
+            tmp_file = f"{self.output_file}.tmp"
+            header = True
+            for df in self.iter_rows():
+                df.to_csv(tmp_file, mode='w' if header else 'a', header=header, index=False)
+                header = False
+            if header:
+                pd.DataFrame(columns=self.columns).to_csv(tmp_file, index=False)
+            os.replace(tmp_file, self.output_file)
+
+
+# ----- Result cache -----
+# Results are also kept in a content-addressed store shared by every sweep,
+# keyed by all they depend on, so re-running or extending a sweep only
+# simulates what has never run with the current engine.
+
+_engine_version = None
+
+
+def engine_version():
+    """Hash of this module's source and the JAX version; any change to the
+    engine gives new result keys"""
+    global _engine_version
+    if _engine_version is None:
+        with open(__file__, 'rb') as f:
+            source = f.read()
+        _engine_version = hashlib.sha256(source + jax.__version__.encode()).hexdigest()[:16]
+    return _engine_version
+
+
+def network_spec(config, N):
+    """Everything the contact network depends on"""
+    return {'generator': 'random_edges', 'seed': NETWORK_SEED, 'max_degree': NETWORK_MAX_DEGREE,
+            'avg_degree': config['avg_degree'], 'N': N}
+
+
+class ResultCache:
+    """Simulation results on disk, one JSON file per (effective config, N,
+    bucket, seed, engine version, network spec).
+    
+    Defaults to the ``results`` directory of the compilation cache
+    ($COVID_ABM_CACHE_DIR, then ~/.cache/covid_abm). Entries are written
+    atomically, so concurrent sweeps can share one store.
+    """
+    
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(
+            os.environ.get('COVID_ABM_CACHE_DIR') or DEFAULT_CACHE_DIR, 'results')
+        self.defaults = FixedGPUABM().config
+    
+    def key(self, config, N, seed, bucket=None):
+        config = {**self.defaults, **{k: v for k, v in config.items() if k in self.defaults}}
+        spec = json.dumps({
+            'config': {k: _canonical_value(v) for k, v in config.items()},
+            'N': N, 'bucket': bucket, 'seed': seed,
+            'engine': engine_version(), 'network': network_spec(config, N),
+        }, sort_keys=True, default=_json_scalar)
+        return hashlib.sha256(spec.encode()).hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+    
+    def get(self, config, N, seed, bucket=None, timeseries=False):
+        """Cached results, or None (also when ``timeseries`` is wanted but
+        was not stored)"""
+        try:
+            with open(self._path(self.key(config, N, seed, bucket))) as f:
+                results = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if timeseries and 'timeseries' not in results:
+            return None
+        if not timeseries:
+            results.pop('timeseries', None)
+        return results
+    
+    def put(self, config, N, seed, bucket, results):
+        path = self._path(self.key(config, N, seed, bucket))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(results, f, default=_json_scalar)
+        os.replace(tmp_path, path)
+
+
+def run_gpu_sweep(n_runs=10, N=100000, output_file="gpu_sweep_results.csv", save_timeseries=True,
+                  bucket=None, n_workers=1, threads_per_worker=1, resume=True, use_result_cache=True):
+    """Run parameter sweep on GPU with per-run checkpointing.
+    
+    Runs are spread over ``n_workers`` processes (see iter_sweep_results);
+    the parent buffers results and writes them in batches (see ResultSink):
+    summaries to ``output_file``, timeseries to one Parquet dataset (see
+    read_timeseries). Completed runs are kept in
+    a task ledger, and with ``resume`` a restarted sweep skips them. With
+    ``use_result_cache`` simulations already in the ResultCache (from any
+    earlier sweep) are not run again.
+    """
+    import pandas as pd
     
     # Define columns for CSV header initialization
     df_cols = ['runtime_days', 'infected', 'reinfected', 'long_covid_cases',
-               'min_productivity', 'param_name', 'param_value', 
+               'min_productivity', 'peak_infected', 'day_of_peak', 'peak_incidence',
+               'day_of_peak_incidence', 'symptomatic_days', 'peak_long_covid',
+               'param_name', 'param_value', 
                'run', 'agents', 'backend']
                
-    # Initialize the CSV file with headers (overwrites any existing data to start fresh)
+    tasks = [
+        SweepTask(param_name, value, run, 42 + run, {param_name: value}, N, bucket, save_timeseries)
+        for param_name, values in ORDER.items()
+        for value in values
+        for run in range(n_runs)
+    ]
+    total_sims = len(tasks)
+    
+    ledger_file = ledger_path(output_file)
+    if not resume and os.path.exists(ledger_file):
+        os.remove(ledger_file)
+    ledger = SweepLedger(ledger_file)
+    done = [task for task in tasks if task in ledger]
+    pending = [task for task in tasks if task not in ledger]
+    
+    # Initialize the output file from the ledger (header only on a fresh start)
+    sink = ResultSink(output_file, ledger, df_cols, rows=[ledger.row(task) for task in done])
     try:
-        pd.DataFrame(columns=df_cols).to_csv(output_file, index=False, mode='w')
-        print(f"✓ Initialized output file: {output_file} with header.")
+        sink.close()
+        print(f"✓ Initialized output file: {output_file} with {len(done)} completed runs.")
     except Exception as e:
         print(f"Warning: Could not initialize output file {output_file}. Error: {e}")
-
-    total_sims = sum(len(values) * n_runs for values in ORDER.values())
     
     print(f"\n{'='*70}")
     print(f"GPU PARAMETER SWEEP")
@@ -775,75 +2133,57 @@ def run_gpu_sweep(n_runs=10, N=100000, output_file="gpu_sweep_results.csv", save
     print(f"Total simulations:   {total_sims}")
     print(f"Backend:             {jax.default_backend().upper()}")
     print(f"Save timeseries:     {save_timeseries}")
+    print(f"Population bucket:   {bucket or 'exact'}")
+    print(f"Workers:             {n_workers} x {threads_per_worker} threads")
+    print(f"Already complete:    {len(done)}")
+    print(f"Unique simulations:  {len(plan_sweep(pending))} of {len(pending)} remaining")
     print(f"{'='*70}\n")
     
     start_time = time.time()
     sim_count = 0
+    total_sims = len(pending)
     
-    for param_name, values in ORDER.items():
-        print(f"\n🔧 Sweeping: {param_name}")
-        
-        for value in values:
-            print(f"  → Value: {value}")
+    result_cache = ResultCache() if use_result_cache else None
+    try:
+        for task, final_metrics, error in iter_sweep_results(pending, n_workers, threads_per_worker,
+                                                             result_cache=result_cache):
+            sim_count += 1
+            param_name, value, run = task.param_name, task.param_value, task.run
+            
+            if error is not None:
+                print(f"    ✗ Error in {param_name}={value} run {run}: {error}")
+                continue
             
-            for run in range(n_runs):
-                sim_count += 1
+            try:
+                # Extract timeseries data before saving summary
+                timeseries_data = final_metrics.pop('timeseries', None)
                 
-                try:
-                    abm = FixedGPUABM()
-                    abm.initialize_simulation(
-                        N=N,
-                        seed=42 + run,
-                        **{param_name: value}
-                    )
-                    
-                    final_metrics = abm.run_simulation(verbose=False, save_timeseries=save_timeseries)
-                    
-                    # Extract timeseries data before saving summary
-                    timeseries_data = None
-                    if save_timeseries and 'timeseries' in final_metrics:
-                        timeseries_data = final_metrics.pop('timeseries')
-                    
-                    final_metrics['param_name'] = param_name
-                    final_metrics['param_value'] = value
-                    final_metrics['run'] = run
-                    final_metrics['agents'] = N
-                    final_metrics['backend'] = jax.default_backend()
-                    
-                    # --- PER-RUN CHECKPOINTING: Append summary data to CSV ---
-                    single_result_df = pd.DataFrame([final_metrics])
-                    single_result_df.to_csv(
-                        output_file, 
-                        mode='a', 
-                        header=False, 
-                        index=False
-                    )
-                    
-                    # Save timeseries data separately if requested
-                    if timeseries_data:
-                        timeseries_file = output_file.replace('.csv', f'_timeseries_{param_name}_{value}_run{run}.csv')
-                        ts_df = pd.DataFrame(timeseries_data)
-                        ts_df['param_name'] = param_name
-                        ts_df['param_value'] = value
-                        ts_df['run'] = run
-                        ts_df.to_csv(timeseries_file, index=False)
-                    
-                    if (run + 1) % 5 == 0:
-                        elapsed = time.time() - start_time
-                        rate = sim_count / elapsed
-                        eta = (total_sims - sim_count) / rate / 60 if rate > 0 else 0
-                        print(f"    ✓ Run {run+1}/{n_runs} complete | ETA: {eta:.1f} min")
-                    
-                    del abm
-                    gc.collect()
-                    
-                except Exception as e:
-                    print(f"    ✗ Error in run {run}: {e}")
-                    continue
+                final_metrics['param_name'] = param_name
+                final_metrics['param_value'] = value
+                final_metrics['run'] = run
+                final_metrics['agents'] = N
+                
+                # --- BUFFERED CHECKPOINTING: summary row and timeseries are written with the next flush ---
+                row = {col: final_metrics[col] for col in df_cols}
+                sink.add(task, row, timeseries_data)
+                
+            except Exception as e:
+                print(f"    ✗ Error saving {param_name}={value} run {run}: {e}")
+                continue
+            
+            if sim_count % 5 == 0:
+                elapsed = time.time() - start_time
+                rate = sim_count / elapsed
+                eta = (total_sims - sim_count) / rate / 60 if rate > 0 else 0
+                print(f"    ✓ {sim_count}/{total_sims} runs complete "
+                      f"({rate * 3600:.0f} sims/hour) | ETA: {eta:.1f} min")
+    finally:
+        # Also on interruption: buffered results are complete runs
+        sink.close()
     
     # --- Final step: Read the data back from disk for summary and plotting ---
     try:
-        df = pd.read_csv(output_file)
+        df = pd.read_parquet(output_file) if output_file.endswith('.parquet') else pd.read_csv(output_file)
     except Exception as e:
         print(f"Error reading final results from CSV: {e}")
         df = pd.DataFrame()
@@ -853,8 +2193,10 @@ def run_gpu_sweep(n_runs=10, N=100000, output_file="gpu_sweep_results.csv", save
     print(f"SWEEP COMPLETE")
     print(f"{'='*70}")
     print(f"Total time:   {total_time/3600:.2f} hours")
-    print(f"Avg per sim:  {total_time/len(df):.1f} seconds")
+    print(f"Avg per sim:  {total_time/max(sim_count, 1):.1f} seconds")
     print(f"Results:      {output_file}")
+    if save_timeseries:
+        print(f"Timeseries:   {timeseries_path(output_file)}/")
     print(f"{'='*70}\n")
     
     return df
@@ -862,6 +2204,8 @@ def run_gpu_sweep(n_runs=10, N=100000, output_file="gpu_sweep_results.csv", save
 
 def make_grid(df, out_png="gpu_results.png"):
     """Generate parameter sweep grid plot"""
+    import matplotlib.pyplot as plt
+    
     cols = list(ORDER.keys())
     rows = METRICS
     nrows = len(rows)
@@ -917,14 +2261,70 @@ def quick_demo():
     return results
 
 
-def full_sweep_and_plot(n_runs=10, N=100000):
+def memory_check(N=100000, max_days=1095):
+    """Verify the compiled run donates its buffers and device memory stays
+    flat across days of a long run"""
+    print("\n" + "="*70)
+    print(f"MEMORY CHECK - {N:,} agents, {max_days} days")
+    print("="*70)
+    
+    abm = FixedGPUABM()
+    abm.initialize_simulation(N=N, seed=42, max_days=max_days)
+    donated = abm.releases_donated_buffers()
+    profile = abm.device_memory_profile()
+    stats = jax.local_devices()[0].memory_stats() or {}
+    
+    # The first chunk includes compilation; every later chunk must reuse the same buffers
+    steady = profile[1:] or profile
+    growth = max(steady) - min(steady)
+    print(f"  Live device memory: {min(steady)/1e6:.1f} MB - {max(steady)/1e6:.1f} MB "
+          f"over {len(profile)} chunks of {RUN_CHUNK_DAYS} days")
+    print(f"  Per-agent state:    {abm.memory_per_agent()} bytes")
+    if 'peak_bytes_in_use' in stats:
+        print(f"  Peak allocator use: {stats['peak_bytes_in_use']/1e6:.1f} MB")
+    print(f"  {'✓ Flat' if growth == 0 else '✗ Growing'} (growth: {growth:,} bytes)")
+    print(f"  {'✓' if donated else '✗'} Donated state buffers {'released' if donated else 'still alive'}")
+    
+    return growth == 0 and donated
+
+
+def export_standard_shapes(sizes=(10000, 100000), bucket='pow2', cache_dir=None):
+    """Export compiled run functions for the default config at each size.
+    
+    Workers that call enable_compilation_cache() and initialize with the
+    same ``bucket`` load these instead of tracing and compiling from scratch.
+    """
+    cache_dir = enable_compilation_cache(cache_dir)
+    export_dir = os.path.join(cache_dir, 'exported')
+    
+    print("\n" + "="*70)
+    print(f"EXPORTING RUN FUNCTIONS -> {export_dir}")
+    print("="*70)
+    
+    paths = []
+    for N in sizes:
+        start = time.time()
+        abm = FixedGPUABM()
+        abm.initialize_simulation(N=N, seed=42, bucket=bucket)
+        path = export_run_function(abm, export_dir)
+        
+        # Compile once so the XLA executable lands in the persistent cache too
+        load_exported_runs(export_dir)
+        abm.run_simulation(verbose=False, save_timeseries=False)
+        paths.append(path)
+        print(f"  ✓ N={N:,} -> {os.path.basename(path)} ({time.time() - start:.1f}s)")
+    
+    return paths
+
+
+def full_sweep_and_plot(n_runs=10, N=100000, n_workers=1):
     """Run full parameter sweep and generate plots"""
     print("\n" + "="*70)
     print("FULL PARAMETER SWEEP + PLOTTING")
     print("="*70)
     
     # Run sweep
-    df = run_gpu_sweep(n_runs=n_runs, N=N, output_file="gpu_sweep_results.csv")
+    df = run_gpu_sweep(n_runs=n_runs, N=N, output_file="gpu_sweep_results.csv", n_workers=n_workers)
     
     # Generate plot
     print("\n📊 Generating plot...")
@@ -951,6 +2351,9 @@ def full_sweep_and_plot(n_runs=10, N=100000):
 if __name__ == "__main__":
     import sys
     
+    print_backend_info()
+    enable_compilation_cache()
+    
     if len(sys.argv) > 1 and sys.argv[1] == "demo":
         # Quick demo
         quick_demo()
@@ -959,12 +2362,25 @@ if __name__ == "__main__":
         # Full sweep
         n_runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
         N = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
-        full_sweep_and_plot(n_runs=n_runs, N=N)
+        n_workers = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+        full_sweep_and_plot(n_runs=n_runs, N=N, n_workers=n_workers)
+    
+    elif len(sys.argv) > 1 and sys.argv[1] == "memcheck":
+        # Device memory must stay flat across days (buffer donation)
+        N = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+        max_days = int(sys.argv[3]) if len(sys.argv) > 3 else 1095
+        sys.exit(0 if memory_check(N=N, max_days=max_days) else 1)
+    
+    elif len(sys.argv) > 1 and sys.argv[1] == "export":
+        # Serialize compiled run functions for worker start-up
+        sizes = [int(n) for n in sys.argv[2:]] or [10000, 100000]
+        export_standard_shapes(sizes=sizes)
     
     elif len(sys.argv) > 1 and sys.argv[1] == "plot":
         # Just plot existing results
         csv_file = sys.argv[2] if len(sys.argv) > 2 else "gpu_sweep_results.csv"
         print(f"\n📊 Loading results from {csv_file}...")
+        import pandas as pd
         df = pd.read_csv(csv_file)
         make_grid(df, out_png="gpu_parameter_sweep.png")
     
@@ -972,7 +2388,9 @@ if __name__ == "__main__":
         # Default: quick demo
         print("\nUsage:")
         print("  python script.py demo              # Quick 10K demo")
-        print("  python script.py sweep [runs] [N]  # Full sweep (default: 10 runs, 100K agents)")
+        print("  python script.py sweep [runs] [N] [workers]  # Full sweep (default: 10 runs, 100K agents, 1 process)")
         print("  python script.py plot [csv_file]   # Plot existing results")
+        print("  python script.py memcheck [N] [days]  # Check device memory stays flat")
+        print("  python script.py export [N ...]    # Export compiled run functions for workers")
         print("\nRunning quick demo...\n")
         quick_demo()
\ No newline at end of file
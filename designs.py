@@ -0,0 +1,288 @@
+"""
+Experimental designs over arbitrary config keys.
+
+Each design returns a DataFrame with one row per design point and one column
+per config key. task_table() crosses a design with a seed array, and
+run_task_table() executes the resulting table with the batched engine
+(covid_abm_model.run_batch), many simulations per compiled call.
+run_conditioned_on_takeoff() samples each point until enough runs escape
+early extinction, reporting the extinction probability separately.
+"""
+
+import itertools
+import math
+import time
+import numpy as np
+import pandas as pd
+from covid_abm_model import FixedGPUABM, ResultCache, run_batch, enable_compilation_cache, print_backend_info
+
+# Simulation settings
+N_AGENTS = 10000  # Population size
+POPULATION_BUCKET = 'pow2'  # One compiled shape for every chunk
+CHUNK_SIZE = 64  # Simulations advanced together per batched call
+SEED_ARRAY = [42, 123, 456]
+OUTPUT_FILE = 'design_results.csv'
+
+# Takeoff screening (run_conditioned_on_takeoff)
+SCREEN_DAYS = 14  # Days every run is simulated before the takeoff check
+TAKEOFF_THRESHOLD = 20  # Cumulative infections a run must exceed by then
+MAX_ATTEMPTS = 200  # Runs per design point before giving up on n_takeoff
+
+METRIC_COLUMNS = ['runtime_days', 'infected', 'reinfected', 'long_covid_cases', 'min_productivity',
+                  'peak_infected', 'day_of_peak', 'peak_incidence', 'day_of_peak_incidence',
+                  'symptomatic_days', 'peak_long_covid']
+
+
+# ============================================
+# DESIGNS
+# ============================================
+
+def full_factorial(levels):
+    """
+    Every combination of ``levels`` ({config key: [values]}).
+    """
+    keys = list(levels)
+    return pd.DataFrame(list(itertools.product(*(levels[k] for k in keys))), columns=keys)
+
+
+def fractional_factorial(factors, generators):
+    """
+    Two-level 2^(k-p) fractional factorial.
+
+    ``factors`` maps every config key to its (low, high) levels. Keys in
+    ``generators`` are not varied independently: each is aliased to the
+    product of the listed base keys, e.g. {'vaccination_pct':
+    ('precaution_pct', 'covid_spread_chance_pct')} gives the generator D = AB.
+    """
+    base = [k for k in factors if k not in generators]
+    coded = pd.DataFrame(list(itertools.product([-1, 1], repeat=len(base))), columns=base)
+    for key, parents in generators.items():
+        coded[key] = np.prod([coded[p] for p in parents], axis=0)
+
+    design = pd.DataFrame({k: np.where(coded[k] < 0, factors[k][0], factors[k][1]) for k in factors})
+    return _round_integer_keys(design)
+
+
+def latin_hypercube(ranges, n, seed=0):
+    """
+    ``n`` Latin hypercube points over ``ranges`` ({config key: (low, high)}).
+    """
+    from scipy.stats import qmc
+    sampler = qmc.LatinHypercube(d=len(ranges), seed=seed)
+    return _scale(sampler.random(n), ranges)
+
+
+def sobol(ranges, n, seed=0, scramble=True):
+    """
+    First ``n`` points of a (scrambled) Sobol sequence over ``ranges``.
+    Balance properties hold when ``n`` is a power of two.
+    """
+    from scipy.stats import qmc
+    sampler = qmc.Sobol(d=len(ranges), scramble=scramble, seed=seed)
+    return _scale(sampler.random(n), ranges)
+
+
+def _scale(unit, ranges):
+    """Map unit-cube samples onto ``ranges``"""
+    keys = list(ranges)
+    low = np.array([ranges[k][0] for k in keys], dtype=float)
+    high = np.array([ranges[k][1] for k in keys], dtype=float)
+    return _round_integer_keys(pd.DataFrame(low + unit * (high - low), columns=keys))
+
+
+def _round_integer_keys(design):
+    """Round keys whose default value is an int (days, agent counts, degree)"""
+    defaults = FixedGPUABM().config
+    for key in design.columns:
+        if isinstance(defaults.get(key), int) and not isinstance(defaults.get(key), bool):
+            design[key] = design[key].round().astype(int)
+    return design
+
+
+# ============================================
+# TASK TABLE
+# ============================================
+
+def task_table(design, seed_array=SEED_ARRAY):
+    """
+    One row per (design point, seed): design_point, replication, seed and
+    the design's config columns.
+    """
+    design = design.reset_index(drop=True)
+    rows = []
+    for point, values in enumerate(design.to_dict('records')):
+        for i, seed in enumerate(seed_array):
+            rows.append({'design_point': point, 'replication': i, 'seed': seed, **values})
+    return pd.DataFrame(rows)
+
+
+def run_task_table(table, n_agents=N_AGENTS, bucket=POPULATION_BUCKET, chunk_size=CHUNK_SIZE,
+                   devices=None, output_file=None, screen_days=None, takeoff_threshold=TAKEOFF_THRESHOLD,
+                   use_result_cache=True):
+    """
+    Execute a task table with the batched engine.
+
+    Rows are grouped by contact network (avg_degree) and CRN mode and run ``chunk_size``
+    at a time; a group's last chunk is padded only up to the next power of
+    two, so calls reuse a few compiled executables without running up to
+    ``chunk_size`` copies of a short group. Returns the table with the
+    run_simulation() metrics appended. With ``screen_days`` runs that have
+    not passed ``takeoff_threshold`` cumulative infections by then are
+    stopped early and a ``took_off`` column is added (see run_batch).
+    Unscreened rows already in the shared ResultCache are not run again
+    (unless ``use_result_cache`` is False).
+    """
+    config_keys = [c for c in table.columns if c not in ('design_point', 'replication', 'seed')]
+    # Rows batched together must share a contact network and the CRN mode (see run_batch)
+    batch_keys = [k for k in ('avg_degree', 'common_random_numbers') if k in table.columns]
+
+    print("\n" + "="*80)
+    print("DESIGN SWEEP (BATCHED)")
+    print("="*80)
+    print(f"Population:        {n_agents:,} agents")
+    print(f"Design points:     {table['design_point'].nunique()} over {', '.join(config_keys)}")
+    print(f"Total simulations: {len(table)}")
+    print(f"Chunk size:        {chunk_size}")
+    print("="*80 + "\n")
+
+    start_time = time.time()
+    metrics = {}
+    result_cache = ResultCache() if use_result_cache and not screen_days else None
+    if result_cache is not None:
+        for index, row in table.iterrows():
+            config = {k: _python_scalar(row[k]) for k in config_keys}
+            results = result_cache.get(config, n_agents, int(row['seed']), bucket)
+            if results is not None:
+                metrics[index] = results
+        if metrics:
+            print(f"    ✓ {len(metrics)}/{len(table)} simulations from the result cache")
+
+    pending = table.drop(index=list(metrics))
+    for _, group in (pending.groupby(batch_keys, sort=False) if batch_keys else [(None, pending)]):
+        for start in range(0, len(group), chunk_size):
+            chunk = group.iloc[start:start + chunk_size]
+            configs = [{k: _python_scalar(row[k]) for k in config_keys} for _, row in chunk.iterrows()]
+            seeds = [int(s) for s in chunk['seed']]
+            n_pad = min(chunk_size, 2 ** math.ceil(math.log2(len(chunk)))) - len(chunk)
+
+            all_results = run_batch(configs + configs[-1:] * n_pad, seeds + seeds[-1:] * n_pad,
+                                    N=n_agents, bucket=bucket, devices=devices,
+                                    screen_days=screen_days, takeoff_threshold=takeoff_threshold)
+            for index, config, seed, results in zip(chunk.index, configs, seeds, all_results):
+                metrics[index] = results
+                if result_cache is not None:
+                    result_cache.put(config, n_agents, seed, bucket, results)
+
+            elapsed = time.time() - start_time
+            print(f"    ✓ {len(metrics)}/{len(table)} simulations | "
+                  f"{len(metrics) / elapsed * 3600:.0f} sims/hour")
+
+    columns = METRIC_COLUMNS + (['took_off'] if screen_days else [])
+    df = table.join(pd.DataFrame.from_dict(metrics, orient='index')[columns])
+    df['n_agents'] = n_agents
+
+    if output_file:
+        df.to_csv(output_file, index=False)
+        print(f"✓ Saved: {output_file}")
+
+    return df
+
+
+def run_conditioned_on_takeoff(design, n_takeoff=10, screen_days=SCREEN_DAYS,
+                               takeoff_threshold=TAKEOFF_THRESHOLD, max_attempts=MAX_ATTEMPTS,
+                               first_seed=0, n_agents=N_AGENTS, bucket=POPULATION_BUCKET,
+                               chunk_size=CHUNK_SIZE, devices=None, output_file=None):
+    """
+    Sample every design point until ``n_takeoff`` runs take off.
+
+    Each round gives the unfinished points as many new seeds as their
+    observed takeoff rate says they still need (capped at ``max_attempts``
+    runs per point) and runs them with takeoff screening, so early
+    extinctions cost ``screen_days`` days instead of a full run. Returns
+    (runs, extinction): every run, screened-out ones included, and the
+    per-point extinction probability (see extinction_summary).
+    """
+    design = design.reset_index(drop=True)
+    attempts = np.zeros(len(design), dtype=int)
+    took_off = np.zeros(len(design), dtype=int)
+    rounds = []
+
+    while True:
+        rows = []
+        for point, values in enumerate(design.to_dict('records')):
+            needed = n_takeoff - took_off[point]
+            if needed <= 0 or attempts[point] >= max_attempts:
+                continue
+            rate = (took_off[point] + 1) / (attempts[point] + 2)  # Laplace estimate
+            n_new = min(math.ceil(needed / rate), max_attempts - attempts[point])
+            for i in range(attempts[point], attempts[point] + n_new):
+                rows.append({'design_point': point, 'replication': i, 'seed': first_seed + i, **values})
+            attempts[point] += n_new
+        if not rows:
+            break
+
+        df = run_task_table(pd.DataFrame(rows), n_agents=n_agents, bucket=bucket, chunk_size=chunk_size,
+                            devices=devices, screen_days=screen_days, takeoff_threshold=takeoff_threshold)
+        took_off += df.groupby('design_point')['took_off'].sum().reindex(design.index, fill_value=0).values
+        rounds.append(df)
+
+    runs = pd.concat(rounds).sort_values(['design_point', 'replication'], ignore_index=True)
+    extinction = extinction_summary(runs)
+    print(f"\n✓ {int(runs['took_off'].sum())} of {len(runs)} runs took off "
+          f"({len(runs) - int(runs['took_off'].sum())} stopped after {screen_days} days)")
+
+    if output_file:
+        runs.to_csv(output_file, index=False)
+        extinction_file = output_file.replace('.csv', '_extinction.csv')
+        extinction.to_csv(extinction_file, index=False)
+        print(f"✓ Saved: {output_file}, {extinction_file}")
+
+    return runs, extinction
+
+
+def extinction_summary(runs):
+    """
+    Per design point: runs, runs that took off, and the early-extinction
+    probability with its 95% CI (normal approximation).
+    """
+    config_keys = [c for c in runs.columns
+                   if c not in ('design_point', 'replication', 'seed', 'n_agents', 'took_off', *METRIC_COLUMNS)]
+    summary = runs.groupby('design_point').agg(
+        **{key: (key, 'first') for key in config_keys},
+        n_runs=('took_off', 'size'),
+        n_took_off=('took_off', 'sum'),
+    ).reset_index()
+    p = 1 - summary['n_took_off'] / summary['n_runs']
+    summary['extinction_probability'] = p
+    summary['extinction_ci95'] = 1.96 * np.sqrt(p * (1 - p) / summary['n_runs'])
+    return summary
+
+
+def _python_scalar(value):
+    return value.item() if hasattr(value, 'item') else value
+
+
+# ============================================
+# MAIN EXECUTION
+# ============================================
+
+def vaccination_precaution_demo():
+    """
+    Vaccination x precaution interaction on a 4 x 4 full factorial.
+    """
+    design = full_factorial({
+        'vaccination_pct': [0, 30, 50, 80],
+        'precaution_pct': [0, 25, 50, 75],
+    })
+    df = run_task_table(task_table(design), output_file=OUTPUT_FILE)
+
+    summary = df.groupby(['vaccination_pct', 'precaution_pct'])['long_covid_cases'].mean().unstack()
+    print("\nMean Long COVID cases (rows: vaccination %, columns: precaution %)")
+    print(summary.round(1).to_string())
+    return df
+
+
+if __name__ == "__main__":
+    print_backend_info()
+    enable_compilation_cache()
+    vaccination_precaution_demo()
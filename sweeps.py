@@ -1,8 +1,10 @@
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from covid_abm_model import FixedGPUABM
+from covid_abm_model import (SweepTask, SweepLedger, ResultCache, ResultSink, iter_sweep_results, plan_sweep,
+                             ledger_path, enable_compilation_cache, print_backend_info)
+import json
+import math
+import os
 import time
 SEED_ARRAY = [42, 123, 456, 789, 1011, 2022, 3033, 4044, 5055, 6066]
 PARAMETER_SWEEP = {
@@ -21,7 +23,26 @@ BASELINE = {
 
 # Simulation settings
 N_AGENTS = 100000  # Population size
+POPULATION_BUCKET = 'pow2'  # Pad to shared array shapes so compiled runs are reused
+N_WORKERS = 1  # Simulation processes (set to the core count on CPU nodes)
+THREADS_PER_WORKER = 1  # Cores pinned to each worker process (bounds its XLA threads)
 OUTPUT_FILE = 'publication_results.csv'
+TASK_CHUNK = 2048  # Tasks planned and dispatched at a time (bounds sweep memory)
+
+# Live statistics (RunningStats, persisted as <output>_stats.json)
+SUMMARY_METRICS = ['runtime_days', 'infected', 'reinfected', 'long_covid_cases', 'min_productivity',
+                   'peak_infected', 'day_of_peak', 'peak_incidence', 'symptomatic_days', 'peak_long_covid']
+QUANTILES = (0.05, 0.5, 0.95)
+STATISTICS_METRICS = ['infected', 'long_covid_cases', 'peak_infected', 'min_productivity']
+BOOTSTRAP_RESAMPLES = 1000
+BOOTSTRAP_BATCH_ELEMENTS = 20_000_000  # Entries per bootstrap index tensor
+SKETCH_ACCURACY = 0.01  # Relative error of the streaming quantiles
+
+# Adaptive replication (run_publication_sweep(adaptive=True))
+ADAPTIVE_METRICS = ['infected', 'long_covid_cases']
+ADAPTIVE_CI_TARGET = 0.05  # 95% CI half-width as a fraction of the mean
+ADAPTIVE_MIN_REPLICATES = 3
+ADAPTIVE_MAX_REPLICATES = 40
 
 
 # ============================================
@@ -32,7 +53,18 @@ def run_publication_sweep(
     param_dict=PARAMETER_SWEEP,
     seed_array=SEED_ARRAY,
     n_agents=N_AGENTS,
-    output_file=OUTPUT_FILE
+    output_file=OUTPUT_FILE,
+    bucket=POPULATION_BUCKET,
+    n_workers=N_WORKERS,
+    threads_per_worker=THREADS_PER_WORKER,
+    resume=True,
+    adaptive=False,
+    ci_metrics=ADAPTIVE_METRICS,
+    ci_target=ADAPTIVE_CI_TARGET,
+    min_replicates=ADAPTIVE_MIN_REPLICATES,
+    max_replicates=ADAPTIVE_MAX_REPLICATES,
+    common_random_numbers=False,
+    use_result_cache=True
 ):
     """
     Run parameter sweep with multiple seeds per parameter value.
@@ -41,125 +73,567 @@ def run_publication_sweep(
     - Tests multiple parameter values (scenarios)
     - Runs each scenario multiple times (uncertainty)
     - Calculates statistics (mean, std, CI)
+    
+    Simulations are spread over ``n_workers`` processes; rows keep the
+    parameter / seed order regardless of completion order. Each result is
+    recorded in a task ledger as it finishes, and with ``resume`` a
+    restarted sweep only runs the missing (config, seed) tasks.
+    
+    With ``adaptive`` each parameter value starts with ``min_replicates``
+    seeds and gets more, in rounds, until the 95% CI half-width of every
+    ``ci_metrics`` mean is within ``ci_target`` (relative to the mean) or it
+    reaches ``max_replicates``.
+    
+    With ``common_random_numbers`` runs with the same seed draw their random
+    numbers per agent and event (see the model's ``common_random_numbers``
+    config key), so parameter values are compared on paired replications;
+    use paired_differences() for the contrasts.
+    
+    With ``use_result_cache`` simulations already in the shared ResultCache
+    (from this or any other sweep) are not run again.
+    
+    Per-value RunningStats are updated as each run lands and saved to
+    ``<output>_stats.json`` with every flush; running_statistics() reads
+    them mid-sweep (or ``python sweeps.py status``).
     """
     
-    all_results = []
-    total_sims = sum(len(values) * len(seed_array) for values in param_dict.values())
-    sim_count = 0
-    start_time = time.time()
+    points = [(param_name, param_value)
+              for param_name, param_values in param_dict.items()
+              for param_value in param_values]
+    seeds = replicate_seeds(seed_array, max_replicates) if adaptive else list(seed_array)
+    
+    ledger_file = ledger_path(output_file)
+    if not resume and os.path.exists(ledger_file):
+        os.remove(ledger_file)
+    ledger = SweepLedger(ledger_file, keep_rows=False)
+    stats_file = stats_path(output_file)
+    if not resume and os.path.exists(stats_file):
+        os.remove(stats_file)
+    crn = {'common_random_numbers': True} if common_random_numbers else {}
+    result_cache = ResultCache() if use_result_cache else None
+    
+    # Running aggregates per parameter value: the saved ones, plus rows
+    # committed after they were saved
+    metrics = list(dict.fromkeys(SUMMARY_METRICS + list(ci_metrics)))
+    saved, last_part = load_running_stats(stats_file)
+    if any(set(metrics) - set(stats.mean) for stats in saved.values()):
+        saved, last_part = {}, None  # Saved with other metrics: rebuild from the rows
+    aggregates = {point: saved.get(point) or RunningStats(metrics) for point in points}
+    
+    def save_stats(part):
+        save_running_stats(stats_file, aggregates, part)
+    
+    sink = ResultSink(output_file, ledger, None, stream=True, on_flush=save_stats)
+    for rows in sink.iter_rows(after=last_part):
+        for row in rows.to_dict('records'):
+            point = (row['param_name'], row['param_value'])
+            if point in aggregates:
+                aggregates[point].update(row)
+    if adaptive:
+        replicates = {point: min(max(min_replicates, aggregates[point].n), max_replicates) for point in points}
+    else:
+        replicates = {point: len(seed_array) for point in points}
     
     print("\n" + "="*80)
     print("PUBLICATION-QUALITY PARAMETER SWEEP")
     print("="*80)
     print(f"Population:        {n_agents:,} agents")
-    print(f"Seeds per param:   {len(seed_array)} replications")
-    print(f"Total simulations: {total_sims}")
+    if adaptive:
+        print(f"Seeds per param:   {min_replicates}-{max_replicates} replications (adaptive, "
+              f"95% CI within {ci_target:.0%} of the mean for {', '.join(ci_metrics)})")
+    else:
+        print(f"Seeds per param:   {len(seed_array)} replications")
+    if common_random_numbers:
+        print(f"Random numbers:    common (paired across parameter values)")
     print(f"Output file:       {output_file}")
+    print(f"Workers:           {n_workers} x {threads_per_worker} threads")
     print("="*80 + "\n")
     
-    # Loop through each parameter
-    for param_name, param_values in param_dict.items():
-        print(f"\n{'='*80}")
-        print(f"SWEEPING: {param_name}")
-        print(f"{'='*80}")
-        
-        # Loop through each value of this parameter
-        for param_value in param_values:
-            print(f"\n  📊 Testing {param_name} = {param_value}")
-            
-            # Run multiple times with different seeds
-            for i, seed in enumerate(seed_array):
-                sim_count += 1
-                
-                # Initialize model
-                abm = FixedGPUABM()
-                
-                # Set baseline config
-                for key, value in BASELINE.items():
-                    if key in abm.config:
-                        abm.config[key] = value
-                
-                # Override the parameter being swept
-                abm.config[param_name] = param_value
-                
-                # Run simulation
-                abm.initialize_simulation(N=n_agents, seed=seed)
-                results = abm.run_simulation(verbose=False, save_timeseries=False)
-                
-                # Add metadata
-                results['param_name'] = param_name
-                results['param_value'] = param_value
-                results['seed'] = seed
-                results['replication'] = i
-                results['n_agents'] = n_agents
-                
-                all_results.append(results)
-                
-                # Progress update
-                if (i + 1) % 5 == 0:
-                    elapsed = time.time() - start_time
-                    rate = sim_count / elapsed if elapsed > 0 else 0
-                    eta = (total_sims - sim_count) / rate / 60 if rate > 0 else 0
-                    print(f"    ✓ Replication {i+1}/{len(seed_array)} | "
-                          f"Progress: {sim_count}/{total_sims} | ETA: {eta:.1f} min")
+    def pending_tasks():
+        for param_name, param_value in points:
+            for i in range(replicates[param_name, param_value]):
+                task = SweepTask(param_name, param_value, i, seeds[i],
+                                 {**BASELINE, **crn, param_name: param_value}, n_agents, bucket)
+                if task not in ledger:
+                    yield task
     
-    # Convert to DataFrame
-    df = pd.DataFrame(all_results)
+    sim_count = 0
+    start_time = time.time()
     
-    # Save raw results
-    df.to_csv(output_file, index=False)
+    try:
+        while True:
+            total_sims = sim_count + sum(1 for _ in pending_tasks())
+            print(f"  Simulations: {sum(replicates.values())} "
+                  f"({sum(replicates.values()) - total_sims + sim_count} already complete)")
+            
+            for chunk in _chunks(pending_tasks(), TASK_CHUNK):
+                for task, results, error in iter_sweep_results(chunk, n_workers, threads_per_worker,
+                                                               result_cache=result_cache):
+                    if error is not None:
+                        raise RuntimeError(f"{task.param_name}={task.param_value} seed {task.seed}: {error}")
+                    sim_count += 1
+                    
+                    # Add metadata
+                    results['param_name'] = task.param_name
+                    results['param_value'] = task.param_value
+                    results['seed'] = task.seed
+                    results['replication'] = task.run
+                    results['n_agents'] = n_agents
+                    
+                    # Aggregates first: a flush inside add() saves them with the row committed
+                    aggregates[task.param_name, task.param_value].update(results)
+                    sink.add(task, results)
+                    
+                    # Progress update
+                    if sim_count % 5 == 0:
+                        elapsed = time.time() - start_time
+                        rate = sim_count / elapsed if elapsed > 0 else 0
+                        eta = (total_sims - sim_count) / rate / 60 if rate > 0 else 0
+                        print(f"    ✓ Progress: {sim_count}/{total_sims} "
+                              f"({rate * 3600:.0f} sims/hour) | ETA: {eta:.1f} min")
+            sink.flush()
+            
+            if not adaptive:
+                break
+            
+            grown = {}
+            for point in points:
+                n = replicates[point]
+                needed = replicates_needed(aggregates[point], ci_metrics, ci_target)
+                if needed > n and n < max_replicates:
+                    grown[point] = min(needed, max_replicates)
+            if not grown:
+                break
+            print(f"\n  ↻ {len(grown)} of {len(points)} parameter values above the CI target; "
+                  f"adding {sum(grown[p] - replicates[p] for p in grown)} replications")
+            replicates.update(grown)
+    finally:
+        # Committed rows -> output_file, also after a failure
+        sink.close()
+    
+    # Read back in parameter / seed order
+    df = pd.read_csv(output_file)
+    order = {point: i for i, point in enumerate(points)}
+    df['_order'] = [order.get(point, len(order)) for point in zip(df['param_name'], df['param_value'])]
+    df = df.sort_values(['_order', 'replication'], kind='stable').drop(columns='_order').reset_index(drop=True)
     
     total_time = time.time() - start_time
     print(f"\n{'='*80}")
     print(f"SWEEP COMPLETE")
     print(f"{'='*80}")
     print(f"Total time:      {total_time/60:.1f} minutes")
-    print(f"Avg per sim:     {total_time/total_sims:.1f} seconds")
+    print(f"Simulations:     {len(df)} ({sim_count} run now)")
+    print(f"Avg per sim:     {total_time/max(sim_count, 1):.1f} seconds")
     print(f"Results saved:   {output_file}")
     print(f"{'='*80}\n")
     
     return df
 
 
+def _chunks(items, size):
+    """Lists of up to ``size`` consecutive items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def replicate_seeds(seed_array, n):
+    """
+    The first ``n`` seeds: ``seed_array`` followed by further seeds spaced
+    like its last two, so adaptive sweeps extend the fixed design.
+    """
+    seeds = list(seed_array[:n])
+    step = seed_array[-1] - seed_array[-2] if len(seed_array) > 1 else 1
+    while len(seeds) < n:
+        seeds.append(seeds[-1] + step)
+    return seeds
+
+
+class QuantileSketch:
+    """
+    Streaming quantiles within ``relative_accuracy`` of the true value
+    (DDSketch: counts in logarithmically sized buckets). Memory grows with
+    the log of the value range, not with the number of values.
+    """
+    
+    def __init__(self, relative_accuracy=SKETCH_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.positive = {}  # bucket -> count
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+    
+    def _bucket(self, x):
+        return math.ceil(math.log(x) / math.log(self.gamma))
+    
+    def _value(self, bucket):
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+    
+    def add(self, x):
+        self.count += 1
+        if x > 0:
+            bucket = self._bucket(x)
+            self.positive[bucket] = self.positive.get(bucket, 0) + 1
+        elif x < 0:
+            bucket = self._bucket(-x)
+            self.negative[bucket] = self.negative.get(bucket, 0) + 1
+        else:
+            self.zeros += 1
+    
+    def merge(self, other):
+        """Add the values of ``other`` (same relative_accuracy)"""
+        self.count += other.count
+        self.zeros += other.zeros
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for bucket, count in theirs.items():
+                mine[bucket] = mine.get(bucket, 0) + count
+    
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.negative, reverse=True):
+            seen += self.negative[bucket]
+            if seen > rank:
+                return -self._value(bucket)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.positive):
+            seen += self.positive[bucket]
+            if seen > rank:
+                return self._value(bucket)
+        return self._value(max(self.positive))
+    
+    def to_dict(self):
+        return {'relative_accuracy': self.relative_accuracy, 'count': self.count, 'zeros': self.zeros,
+                'positive': self.positive, 'negative': self.negative}
+    
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d['relative_accuracy'])
+        sketch.count, sketch.zeros = d['count'], d['zeros']
+        sketch.positive = {int(k): v for k, v in d['positive'].items()}
+        sketch.negative = {int(k): v for k, v in d['negative'].items()}
+        return sketch
+
+
+class RunningStats:
+    """
+    Streaming count, mean, standard deviation (Welford), min, max and
+    quantile sketch of each of ``metrics``; mean and std match np.mean /
+    np.std of all rows seen so far.
+    """
+    
+    def __init__(self, metrics):
+        self.n = 0
+        self.mean = {metric: 0.0 for metric in metrics}
+        self.m2 = {metric: 0.0 for metric in metrics}
+        self.min = {metric: np.inf for metric in metrics}
+        self.max = {metric: -np.inf for metric in metrics}
+        self.sketch = {metric: QuantileSketch() for metric in metrics}
+    
+    def update(self, row):
+        self.n += 1
+        for metric in self.mean:
+            value = float(row[metric])
+            delta = value - self.mean[metric]
+            self.mean[metric] += delta / self.n
+            self.m2[metric] += delta * (value - self.mean[metric])
+            self.min[metric] = min(self.min[metric], value)
+            self.max[metric] = max(self.max[metric], value)
+            self.sketch[metric].add(value)
+    
+    def merge(self, other):
+        """Add the rows seen by ``other`` (Chan et al.'s pairwise update)"""
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        for metric in self.mean:
+            delta = other.mean[metric] - self.mean[metric]
+            self.mean[metric] += delta * other.n / n
+            self.m2[metric] += other.m2[metric] + delta ** 2 * self.n * other.n / n
+            self.min[metric] = min(self.min[metric], other.min[metric])
+            self.max[metric] = max(self.max[metric], other.max[metric])
+            self.sketch[metric].merge(other.sketch[metric])
+        self.n = n
+    
+    def std(self, metric):
+        return np.sqrt(self.m2[metric] / self.n)
+    
+    def ci95(self, metric):
+        """Same half-width as ci95_halfwidth()"""
+        return 1.96 * self.std(metric) / np.sqrt(self.n)
+    
+    def to_dict(self):
+        return {'n': self.n, 'metrics': {
+            metric: {'mean': self.mean[metric], 'm2': self.m2[metric], 'min': self.min[metric],
+                     'max': self.max[metric], 'sketch': self.sketch[metric].to_dict()}
+            for metric in self.mean
+        }}
+    
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(d['metrics'])
+        stats.n = d['n']
+        for metric, m in d['metrics'].items():
+            stats.mean[metric], stats.m2[metric] = m['mean'], m['m2']
+            stats.min[metric], stats.max[metric] = m['min'], m['max']
+            stats.sketch[metric] = QuantileSketch.from_dict(m['sketch'])
+        return stats
+
+
+def stats_path(output_file):
+    return os.path.splitext(output_file)[0] + '_stats.json'
+
+
+def save_running_stats(path, aggregates, last_part):
+    """
+    Write ``aggregates`` ({(param_name, param_value): RunningStats}) and the
+    last ResultSink part they include, atomically.
+    """
+    points = [{'param_name': name, 'param_value': value, **stats.to_dict()}
+              for (name, value), stats in aggregates.items() if stats.n]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'last_part': last_part, 'points': points}, f, default=float)
+    os.replace(tmp_path, path)
+
+
+def load_running_stats(path):
+    """(aggregates, last part) saved by save_running_stats; ({}, None) if none"""
+    if not os.path.exists(path):
+        return {}, None
+    with open(path) as f:
+        saved = json.load(f)
+    aggregates = {(p['param_name'], p['param_value']): RunningStats.from_dict(p) for p in saved['points']}
+    return aggregates, saved['last_part']
+
+
+def running_statistics(output_file=OUTPUT_FILE):
+    """
+    calculate_statistics() columns (plus streaming quantiles) from the saved
+    RunningStats of a finished or running sweep, without reading its rows.
+    """
+    aggregates, _ = load_running_stats(stats_path(output_file))
+    stats_list = []
+    for (param_name, param_value), running in aggregates.items():
+        stats = {'param_name': param_name, 'param_value': param_value}
+        for metric in running.mean:
+            std = running.std(metric)
+            stats[f'{metric}_mean'] = running.mean[metric]
+            stats[f'{metric}_std'] = std
+            stats[f'{metric}_sem'] = std / np.sqrt(running.n)
+            stats[f'{metric}_ci95'] = running.ci95(metric)
+            stats[f'{metric}_min'] = running.min[metric]
+            stats[f'{metric}_max'] = running.max[metric]
+            for q in QUANTILES:
+                stats[f'{metric}_q{round(q * 100):02d}'] = running.sketch[metric].quantile(q)
+        stats['n_replications'] = running.n
+        stats_list.append(stats)
+    return pd.DataFrame(stats_list)
+
+
+def print_running_summary(output_file=OUTPUT_FILE):
+    """
+    Live per-value summary of a sweep from its saved RunningStats
+    """
+    stats_df = running_statistics(output_file)
+    if stats_df.empty:
+        print(f"No statistics saved yet for {output_file}")
+        return stats_df
+    
+    print(f"\n{'Parameter':<26} {'Value':>8} {'n':>4}  {'Infected (mean ± 95% CI)':<26} {'Median [5%, 95%]':<24}")
+    print("─"*92)
+    for _, row in stats_df.iterrows():
+        print(f"{row['param_name']:<26} {row['param_value']:>8.1f} {row['n_replications']:>4.0f}  "
+              f"{row['infected_mean']:>10.0f} ± {row['infected_ci95']:<13.0f} "
+              f"{row['infected_q50']:>6.0f} [{row['infected_q05']:.0f}, {row['infected_q95']:.0f}]")
+    return stats_df
+
+
+def replicates_needed(stats, metrics, ci_target):
+    """
+    Replications needed for every metric's 95% CI half-width to be within
+    ``ci_target`` of its mean, projected from the current spread (the CI
+    shrinks with the square root of the number of replications). ``stats``
+    is the parameter value's RunningStats.
+    """
+    n = stats.n
+    needed = n
+    for metric in metrics:
+        half_width = stats.ci95(metric)
+        target = ci_target * abs(stats.mean[metric])
+        if half_width <= target:
+            continue
+        needed = max(needed, n + 1 if target == 0 else int(np.ceil(n * (half_width / target) ** 2)))
+    return needed
+
+
 # ============================================
 # STATISTICAL ANALYSIS
 # ============================================
 
-def calculate_statistics(df):
+def ci95_halfwidth(values):
+    """
+    Half-width of the 95% confidence interval of the mean (normal approximation)
+    """
+    return 1.96 * np.std(values) / np.sqrt(len(values))
+
+
+def calculate_statistics(df, metrics=None, by=('param_name', 'param_value'), bootstrap=0,
+                         percentiles=False, level=0.95, seed=0):
     """
     Calculate mean, std, confidence intervals for each parameter value.
     This is what you report in publications!
-    """
     
-    # Group by parameter name and value
-    grouped = df.groupby(['param_name', 'param_value'])
+    ``metrics`` defaults to the STATISTICS_METRICS present in ``df``. The
+    moments come from one groupby().agg pass. With ``bootstrap`` resamples
+    the percentile bootstrap CI of each mean is added ({metric}_boot_lo /
+    _boot_hi); with ``percentiles`` the central ``level`` interval of the
+    runs themselves ({metric}_p_lo / _p_hi).
     
-    # Calculate statistics for key metrics
-    metrics = ['infected', 'long_covid_cases', 'peak_infected', 'min_productivity']
+    Missing values (NaN) are left out per metric: ``{metric}_n`` counts the
+    runs each metric's statistics use, ``n_replications`` all runs.
+    """
+    by = list(by)
+    if metrics is None:
+        metrics = [m for m in STATISTICS_METRICS if m in df.columns]
+    
+    # count / mean / var / min / max of every metric in one pass
+    grouped = df.groupby(by)
+    agg = grouped[metrics].agg(['count', 'mean', 'var', 'min', 'max'])
+    size = grouped.size().to_numpy()
+    
+    stats = agg.index.to_frame(index=False)
+    for metric in metrics:
+        n = agg[(metric, 'count')].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(agg[(metric, 'var')].fillna(0).to_numpy() * (n - 1) / n)  # np.std (ddof=0)
+        stats[f'{metric}_n'] = n
+        stats[f'{metric}_mean'] = agg[(metric, 'mean')].to_numpy()
+        stats[f'{metric}_std'] = std
+        stats[f'{metric}_sem'] = std / np.sqrt(n)  # Standard error of mean
+        stats[f'{metric}_ci95'] = 1.96 * std / np.sqrt(n)  # 95% confidence interval (ci95_halfwidth)
+        stats[f'{metric}_min'] = agg[(metric, 'min')].to_numpy()
+        stats[f'{metric}_max'] = agg[(metric, 'max')].to_numpy()
+    
+    if bootstrap or percentiles:
+        # Rows in group order, so every group is one contiguous block
+        codes = grouped.ngroup().to_numpy()
+        order = np.argsort(codes, kind='stable')
+        codes, values = codes[order], df[metrics].to_numpy(dtype=float)[order]
+        grouped_rows = codes >= 0  # Rows with a missing group key are in no group
+        codes, values = codes[grouped_rows], values[grouped_rows]
+        alpha = (1 - level) / 2
+        
+        intervals = {kind: (np.full((len(size), len(metrics)), np.nan),
+                            np.full((len(size), len(metrics)), np.nan))
+                     for kind, enabled in (('boot', bootstrap), ('p', percentiles)) if enabled}
+        
+        # Without missing values all metrics share one block layout; otherwise
+        # each metric is resampled over its own non-missing rows
+        layouts = [list(range(len(metrics)))] if not np.isnan(values).any() else [[j] for j in range(len(metrics))]
+        for cols in layouts:
+            valid = ~np.isnan(values[:, cols[0]])
+            block_codes, block_values = codes[valid], values[valid][:, cols]
+            sizes = np.bincount(block_codes, minlength=len(size))
+            has = sizes > 0  # Groups with no values keep NaN
+            starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])[has]
+            
+            if bootstrap:
+                lo, hi = bootstrap_mean_ci(block_values, starts, sizes[has], bootstrap, alpha, seed)
+                intervals['boot'][0][np.ix_(has, cols)], intervals['boot'][1][np.ix_(has, cols)] = lo, hi
+            if percentiles:
+                lo, hi = (group_quantile(block_values, block_codes, starts, sizes[has], q) for q in (alpha, 1 - alpha))
+                intervals['p'][0][np.ix_(has, cols)], intervals['p'][1][np.ix_(has, cols)] = lo, hi
+        
+        for kind, (lo, hi) in intervals.items():
+            for j, metric in enumerate(metrics):
+                stats[f'{metric}_{kind}_lo'] = lo[:, j]
+                stats[f'{metric}_{kind}_hi'] = hi[:, j]
+    
+    stats['n_replications'] = size
+    return stats
+
+
+def bootstrap_mean_ci(values, starts, sizes, n_resamples, alpha, seed=0):
+    """
+    Percentile bootstrap CI of each group's mean, for every column of
+    ``values`` (rows grouped in contiguous blocks at ``starts`` of ``sizes``).
     
+    Each batch of resamples is one (resamples, rows) index tensor: every row
+    position draws a row of its own group, and np.add.reduceat sums the
+    groups. Returns (lo, hi) arrays of shape (groups, columns).
+    """
+    rng = np.random.default_rng(seed)
+    group_of_row = np.repeat(np.arange(len(sizes)), sizes)
+    row_start, row_size = starts[group_of_row], sizes[group_of_row]
+    
+    # Keep each index tensor around BOOTSTRAP_BATCH_ELEMENTS entries
+    batch = max(1, min(n_resamples, BOOTSTRAP_BATCH_ELEMENTS // max(len(values) * values.shape[1], 1)))
+    means = []
+    for done in range(0, n_resamples, batch):
+        b = min(batch, n_resamples - done)
+        idx = row_start + (rng.random((b, len(values))) * row_size).astype(np.int64)
+        sums = np.add.reduceat(values[idx], starts, axis=1)  # (b, groups, columns)
+        means.append(sums / sizes[None, :, None])
+    means = np.concatenate(means)
+    return np.quantile(means, alpha, axis=0), np.quantile(means, 1 - alpha, axis=0)
+
+
+def group_quantile(values, codes, starts, sizes, q):
+    """
+    Quantile ``q`` (linear interpolation, as np.quantile) of each column of
+    ``values`` within each contiguous group block; shape (groups, columns).
+    """
+    position = starts + q * (sizes - 1)
+    below = np.floor(position).astype(np.int64)
+    above = np.minimum(below + 1, starts + sizes - 1)
+    frac = (position - below)[:, None]
+    
+    result = np.empty((len(sizes), values.shape[1]))
+    for j in range(values.shape[1]):
+        ranked = values[np.lexsort((values[:, j], codes)), j]  # sorted within each group
+        result[:, j] = ranked[below] * (1 - frac[:, 0]) + ranked[above] * frac[:, 0]
+    return result
+
+
+def paired_differences(df, metrics=('infected', 'long_covid_cases')):
+    """
+    Difference of each parameter value from the first value of its parameter,
+    paired by seed. With common random numbers the paired CI is much
+    narrower than the one from two independent means.
+    """
     stats_list = []
-    for (param_name, param_value), group in grouped:
-        stats = {'param_name': param_name, 'param_value': param_value}
+    for param_name, group in df.groupby('param_name', sort=False):
+        reference_value = group['param_value'].iloc[0]
+        reference = group[group['param_value'] == reference_value].set_index('seed')
         
-        for metric in metrics:
-            values = group[metric].values
-            mean = np.mean(values)
-            std = np.std(values)
-            sem = std / np.sqrt(len(values))  # Standard error of mean
-            ci_95 = 1.96 * sem  # 95% confidence interval
+        for param_value, runs in group.groupby('param_value'):
+            if param_value == reference_value:
+                continue
+            runs = runs.set_index('seed')
+            seeds = runs.index.intersection(reference.index)
+            stats = {'param_name': param_name, 'param_value': param_value,
+                     'reference_value': reference_value}
             
-            stats[f'{metric}_mean'] = mean
-            stats[f'{metric}_std'] = std
-            stats[f'{metric}_sem'] = sem
-            stats[f'{metric}_ci95'] = ci_95
-            stats[f'{metric}_min'] = np.min(values)
-            stats[f'{metric}_max'] = np.max(values)
-        
-        stats['n_replications'] = len(group)
-        stats_list.append(stats)
+            for metric in metrics:
+                diff = runs.loc[seeds, metric].values - reference.loc[seeds, metric].values
+                stats[f'{metric}_diff_mean'] = np.mean(diff)
+                stats[f'{metric}_diff_ci95'] = ci95_halfwidth(diff)
+            
+            stats['n_pairs'] = len(seeds)
+            stats_list.append(stats)
     
-    stats_df = pd.DataFrame(stats_list)
-    return stats_df
+    return pd.DataFrame(stats_list)
 
 
 # ============================================
@@ -170,6 +644,8 @@ def plot_publication_figures(df, stats_df, output_prefix='publication'):
     """
     Generate publication-quality figures with error bars
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     
     # Set publication style
     sns.set_style("whitegrid")
@@ -230,6 +706,7 @@ def plot_summary_table(stats_df, output_file='publication_summary_table.png'):
     """
     Create a summary table for publication
     """
+    import matplotlib.pyplot as plt
     
     # Create summary for Long COVID (most important metric)
     summary = stats_df[['param_name', 'param_value', 
@@ -381,7 +858,7 @@ def main():
     
     # Step 2: Calculate statistics
     print("\nSTEP 2: Calculating statistics...")
-    stats_df = calculate_statistics(df)
+    stats_df = calculate_statistics(df, bootstrap=BOOTSTRAP_RESAMPLES, percentiles=True)
     stats_df.to_csv('publication_statistics.csv', index=False)
     print("✓ Saved: publication_statistics.csv")
     
@@ -447,6 +924,14 @@ def quick_test():
 if __name__ == "__main__":
     import sys
     
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        # Live statistics of a running (or finished) sweep
+        print_running_summary(sys.argv[2] if len(sys.argv) > 2 else OUTPUT_FILE)
+        sys.exit(0)
+    
+    print_backend_info()
+    enable_compilation_cache()
+    
     if len(sys.argv) > 1 and sys.argv[1] == 'test':
         # Quick test
         quick_test()
@@ -0,0 +1,304 @@
+import json
+import os
+import subprocess
+import sys
+
+import jax
+import jax.numpy as jnp
+import pandas as pd
+import pytest
+
+import covid_abm_model
+from covid_abm_model import (FixedGPUABM, ResultSink, SweepLedger, SweepTask, ledger_path, read_timeseries,
+                             iter_sweep_results, plan_sweep, run_batch, run_days, run_gpu_sweep, step_params,
+                             task_key, timeseries_path, ORDER, RUN_CHUNK_DAYS)
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def small_model(**config):
+    abm = FixedGPUABM()
+    abm.initialize_simulation(N=1000, seed=7, **config)
+    return abm
+
+
+def test_infected_period_beyond_timer_range_is_rejected():
+    with pytest.raises(ValueError, match='infected_period'):
+        small_model(infected_period=200)
+    abm = small_model(infected_period=127, max_days=5)
+    abm.run_simulation(verbose=False, save_timeseries=False)
+    assert int(abm.state.infectious_end.max()) <= 127
+
+
+def test_run_days_deletes_donated_buffers():
+    abm = small_model()
+    state, acc = abm.state, abm._new_accumulators()
+    run_days(state, acc, abm.neighbors, step_params(abm.config, abm.N), 0, n_days=RUN_CHUNK_DAYS)
+    assert all(x.is_deleted() for x in jax.tree_util.tree_leaves((state, acc)))
+
+
+def test_undonated_run_keeps_buffers():
+    # The check above must be able to fail
+    abm = small_model()
+    state, acc = abm.state, abm._new_accumulators()
+    undonated = jax.jit(run_days.__wrapped__, static_argnames=('n_days',))
+    undonated(state, acc, abm.neighbors, step_params(abm.config, abm.N), 0, n_days=RUN_CHUNK_DAYS)
+    assert not any(x.is_deleted() for x in jax.tree_util.tree_leaves((state, acc)))
+
+
+def test_releases_donated_buffers_leaves_model_unchanged():
+    abm = small_model()
+    before = jax.tree_util.tree_map(jnp.copy, abm.state)
+    assert abm.releases_donated_buffers()
+    assert all(bool(jnp.array_equal(a, b)) for a, b in zip(abm.state, before))
+    abm.run_simulation(verbose=False, save_timeseries=False)
+
+
+def test_donated_accumulators_leave_model_key_alive():
+    abm = small_model()
+    run_days(abm.state, abm._new_accumulators(), abm.neighbors, step_params(abm.config, abm.N), 0,
+             n_days=RUN_CHUNK_DAYS)
+    assert not abm.key.is_deleted()
+
+
+def test_device_memory_profile_is_flat():
+    abm = small_model()
+    profile = abm.device_memory_profile(n_days=4 * RUN_CHUNK_DAYS)
+    assert len(profile) == 4
+    # The first chunk includes compilation
+    assert max(profile[1:]) == min(profile[1:])
+
+
+def test_resume_from_checkpoint_is_bit_identical(tmp_path):
+    path = str(tmp_path / 'checkpoint.npz')
+    expected = small_model().run_simulation(verbose=False)
+    
+    small_model().run_simulation(verbose=False, checkpoint_every_days=RUN_CHUNK_DAYS, checkpoint_path=path)
+    resumed = FixedGPUABM().load_checkpoint(path).run_simulation(verbose=False)
+    assert resumed == expected
+
+
+def test_resume_with_timeseries_from_checkpoint_without_it(tmp_path):
+    path = str(tmp_path / 'checkpoint.npz')
+    expected = small_model().run_simulation(verbose=False)
+    
+    small_model().run_simulation(verbose=False, save_timeseries=False,
+                                 checkpoint_every_days=RUN_CHUNK_DAYS, checkpoint_path=path)
+    abm = FixedGPUABM().load_checkpoint(path)
+    first_day = abm._progress[1]
+    resumed = abm.run_simulation(verbose=False)
+    
+    assert resumed['timeseries'] == [row for row in expected['timeseries'] if row['day'] >= first_day]
+    assert {k: v for k, v in resumed.items() if k != 'timeseries'} == \
+        {k: v for k, v in expected.items() if k != 'timeseries'}
+
+
+BATCH_CONFIGS = [{'vaccination_pct': 30, 'v_start_time': 10}, {'precaution_pct': 50}, {}]
+BATCH_SEEDS = [3, 4, 5]
+
+
+def single_runs(configs, seeds, N=1000):
+    results = []
+    for config, seed in zip(configs, seeds):
+        abm = FixedGPUABM()
+        abm.initialize_simulation(N=N, seed=seed, **config)
+        results.append(abm.run_simulation(verbose=False))
+    return results
+
+
+def test_batch_matches_single_runs():
+    assert run_batch(BATCH_CONFIGS, BATCH_SEEDS, N=1000, save_timeseries=True) == \
+        single_runs(BATCH_CONFIGS, BATCH_SEEDS)
+
+
+def test_sharded_batch_matches_single_runs():
+    # Forced host devices must be set before JAX starts, so the sharded batch runs in its own process
+    script = (f"import json, jax, covid_abm_model as m; assert len(jax.devices()) == 2; "
+              f"print(json.dumps(m.run_batch({BATCH_CONFIGS!r}, {BATCH_SEEDS!r}, N=1000, save_timeseries=True)))")
+    env = {**os.environ, 'XLA_FLAGS': '--xla_force_host_platform_device_count=2', 'JAX_PLATFORMS': 'cpu'}
+    out = subprocess.run([sys.executable, '-c', script], cwd=REPO, env=env, capture_output=True, text=True, check=True)
+    sharded = json.loads(out.stdout.strip().splitlines()[-1])
+    assert sharded == json.loads(json.dumps(single_runs(BATCH_CONFIGS, BATCH_SEEDS)))
+
+
+def test_forks_match_full_runs():
+    scenarios = [
+        {'vaccination_pct': 50, 'v_start_time': 0},
+        {'vaccination_pct': 80, 'v_start_time': 15, 'efficiency_pct': 60},
+        {'vaccination_pct': 30, 'v_start_time': 40, 'boosted_pct': 0},
+        {'vaccination_pct': 50, 'v_start_time': 300},  # After the epidemic has ended
+    ]
+    forks = small_model().fork_scenarios(scenarios, save_timeseries=True)
+    full_runs = [small_model(**overrides).run_simulation(verbose=False) for overrides in scenarios]
+    
+    assert full_runs[-1]['runtime_days'] < scenarios[-1]['v_start_time']
+    for fork, full in zip(forks, full_runs):
+        assert fork == full
+
+
+def sweep_task(run=0, **fields):
+    return SweepTask('precaution_pct', 30, run, 42 + run, {'precaution_pct': 30}, 1000, **fields)
+
+
+def test_ledger_reopen_drops_torn_last_line(tmp_path):
+    path = str(tmp_path / 'ledger.jsonl')
+    ledger = SweepLedger(path)
+    ledger.record_many([(sweep_task(0), {'infected': 1}), (sweep_task(1), {'infected': 2})])
+    with open(path, 'ab') as f:
+        f.write(b'{"key": "torn')
+    
+    ledger = SweepLedger(path)
+    assert len(ledger) == 2 and ledger.row(sweep_task(1)) == {'infected': 2}
+    ledger.record(sweep_task(2), {'infected': 3})
+    assert len(SweepLedger(path)) == 3
+
+
+def test_task_key_covers_timeseries_and_engine_version(monkeypatch):
+    task = sweep_task()
+    assert task_key(task) == task_key(sweep_task())
+    assert task_key(task) != task_key(task._replace(save_timeseries=True))
+    key = task_key(task)
+    monkeypatch.setattr(covid_abm_model, '_engine_version', 'another-engine')
+    assert task_key(task) != key
+
+
+def fake_sweep_results(ran, fail_after=None):
+    """iter_sweep_results stand-in that records the tasks it is asked to run"""
+    def iter_sweep_results(tasks, *args, **kwargs):
+        for task in tasks:
+            if fail_after is not None and len(ran) == fail_after:
+                raise KeyboardInterrupt
+            ran.append(task)
+            yield task, {'runtime_days': 1, 'infected': task.seed, 'reinfected': 0, 'long_covid_cases': 0,
+                         'min_productivity': 100.0, 'peak_infected': 1, 'day_of_peak': 0, 'peak_incidence': 1,
+                         'day_of_peak_incidence': 0, 'symptomatic_days': 0, 'peak_long_covid': 0,
+                         'backend': 'cpu'}, None
+    return iter_sweep_results
+
+
+def test_gpu_sweep_resume(tmp_path, monkeypatch):
+    output_file = str(tmp_path / 'sweep.csv')
+    sweep = dict(n_runs=1, N=1000, output_file=output_file, save_timeseries=False, use_result_cache=False)
+    n_tasks = sum(len(values) for values in covid_abm_model.ORDER.values())
+    
+    # Interrupted: the finished tasks are still committed
+    ran = []
+    monkeypatch.setattr(covid_abm_model, 'iter_sweep_results', fake_sweep_results(ran, fail_after=10))
+    try:
+        run_gpu_sweep(**sweep)
+    except KeyboardInterrupt:
+        pass
+    assert len(pd.read_csv(output_file)) == 10
+    
+    # Resumed: only the missing tasks run
+    ran = []
+    monkeypatch.setattr(covid_abm_model, 'iter_sweep_results', fake_sweep_results(ran))
+    df = run_gpu_sweep(**sweep)
+    assert len(ran) == n_tasks - 10 and len(df) == n_tasks
+    
+    ran.clear()
+    assert len(run_gpu_sweep(**sweep)) == n_tasks and not ran
+    
+    # Without resume the ledger is deleted and everything runs again
+    assert len(run_gpu_sweep(**sweep, resume=False)) == n_tasks and len(ran) == n_tasks
+    assert len(SweepLedger(ledger_path(output_file))) == n_tasks
+    with open(ledger_path(output_file)) as f:
+        assert len(f.readlines()) == n_tasks
+
+
+SINK_COLUMNS = ['infected', 'param_name', 'param_value', 'run']
+
+
+def sink_row(task):
+    return {'infected': task.seed, 'param_name': task.param_name, 'param_value': task.param_value, 'run': task.run}
+
+
+def test_sink_appends_each_flush_and_repairs_a_torn_append(tmp_path):
+    output_file = str(tmp_path / 'sweep.csv')
+    ledger = SweepLedger(ledger_path(output_file))
+    sink = ResultSink(output_file, ledger, SINK_COLUMNS, flush_rows=2)
+    for run in range(5):
+        sink.add(sweep_task(run), sink_row(sweep_task(run)))
+    assert list(pd.read_csv(output_file)['run']) == [0, 1, 2, 3]
+    sink.close()
+    assert list(pd.read_csv(output_file)['run']) == [0, 1, 2, 3, 4]
+    
+    with open(output_file, 'a') as f:
+        f.write('99,precaution')  # Crash in the middle of an append
+    ledger = SweepLedger(ledger_path(output_file))
+    done = [sweep_task(run) for run in range(5)]
+    sink = ResultSink(output_file, ledger, SINK_COLUMNS, rows=[ledger.row(task) for task in done])
+    sink.add(sweep_task(5), sink_row(sweep_task(5)))
+    sink.close()
+    assert list(pd.read_csv(output_file)['run']) == [0, 1, 2, 3, 4, 5]
+
+
+def test_sink_removes_uncommitted_parts(tmp_path):
+    output_file = str(tmp_path / 'sweep.csv')
+    ledger = SweepLedger(ledger_path(output_file))
+    sink = ResultSink(output_file, ledger, SINK_COLUMNS, stream=True)
+    timeseries = [{'day': 0, 'infected': 1, 'immune': 0, 'long_covid': 0, 'productivity': 100.0}]
+    sink.add(sweep_task(0), sink_row(sweep_task(0)), timeseries)
+    sink.flush()
+    
+    # Files of a flush that crashed before reaching the ledger
+    partition = os.path.join(timeseries_path(output_file), 'param_name=precaution_pct', 'param_value=30')
+    for directory in (partition, sink.rows_dir):
+        pd.DataFrame({'x': [1]}).to_parquet(os.path.join(directory, 'part-ffffffffffffffff00000000.parquet'))
+        open(os.path.join(directory, '.part-ffffffffffffffff00000000.parquet.tmp'), 'w').close()
+    
+    sink = ResultSink(output_file, SweepLedger(ledger_path(output_file)), SINK_COLUMNS, stream=True)
+    assert len(os.listdir(partition)) == len(os.listdir(sink.rows_dir)) == 1
+    assert [len(df) for df in sink.iter_rows()] == [1]
+    assert len(read_timeseries(output_file)) == 1
+
+
+def test_stream_sink_without_results(tmp_path):
+    for name in ('sweep.csv', 'sweep.parquet'):
+        output_file = str(tmp_path / name)
+        ResultSink(output_file, SweepLedger(ledger_path(output_file)), SINK_COLUMNS, stream=True).close()
+        df = pd.read_parquet(output_file) if name.endswith('.parquet') else pd.read_csv(output_file)
+        assert df.empty
+
+
+def order_tasks(n_runs=1, N=1000):
+    return [SweepTask(name, value, run, 42 + run, {name: value}, N)
+            for name, values in ORDER.items() for value in values for run in range(n_runs)]
+
+
+def test_plan_sweep_collapses_duplicate_simulations():
+    tasks = order_tasks(n_runs=2)
+    plan = plan_sweep(tasks)
+    
+    # The default value of five swept parameters is the same baseline simulation
+    assert len(tasks) == 48 and len(plan) == 40
+    baseline = [copies for copies in plan.values() if len(copies) > 1]
+    assert len(baseline) == 2 and all(len(copies) == 5 for copies in baseline)
+    assert {task.param_name for task in baseline[0]} == \
+        {'covid_spread_chance_pct', 'initial_infected_agents', 'precaution_pct', 'v_start_time', 'vaccination_pct'}
+    
+    # int and float spellings of a value, and explicit defaults, are the same simulation
+    assert len(plan_sweep([sweep_task()._replace(config={'covid_spread_chance_pct': 10}),
+                           sweep_task()._replace(config={'covid_spread_chance_pct': 10.0}),
+                           sweep_task()._replace(config={})])) == 1
+    # ... but other seeds and timeseries settings are not
+    assert len(plan_sweep([sweep_task(), sweep_task(run=1), sweep_task(save_timeseries=True)])) == 3
+
+
+def test_duplicate_tasks_run_once(monkeypatch):
+    calls = []
+    run_simulation = FixedGPUABM.run_simulation
+    
+    def counting_run_simulation(self, *args, **kwargs):
+        calls.append(self.config)
+        return run_simulation(self, *args, **kwargs)
+    
+    monkeypatch.setattr(FixedGPUABM, 'run_simulation', counting_run_simulation)
+    tasks = [SweepTask('covid_spread_chance_pct', 10, 0, 42, {'covid_spread_chance_pct': 10}, 1000),
+             SweepTask('precaution_pct', 50.0, 0, 42, {'precaution_pct': 50.0}, 1000),
+             SweepTask('v_start_time', 180, 0, 42, {'v_start_time': 180}, 1000)]
+    results = list(iter_sweep_results(tasks))
+    
+    assert len(calls) == 1
+    assert sorted(task.param_name for task, _, _ in results) == sorted(task.param_name for task in tasks)
+    assert all(error is None and r == results[0][1] for _, r, error in results)
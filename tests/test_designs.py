@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+import designs
+from covid_abm_model import FixedGPUABM
+from designs import (extinction_summary, fractional_factorial, full_factorial, latin_hypercube,
+                     run_conditioned_on_takeoff, run_task_table, sobol, task_table, METRIC_COLUMNS)
+
+
+def test_full_factorial():
+    design = full_factorial({'vaccination_pct': [0, 50, 80], 'precaution_pct': [0, 50]})
+    assert len(design) == 6
+    assert set(map(tuple, design.to_numpy())) == {(v, p) for v in (0, 50, 80) for p in (0, 50)}
+
+
+def test_fractional_factorial_aliasing():
+    factors = {
+        'precaution_pct': (0, 80),
+        'covid_spread_chance_pct': (5, 20),
+        'avg_degree': (5, 30),
+        'vaccination_pct': (0, 80),
+    }
+    design = fractional_factorial(factors, {'vaccination_pct': ('precaution_pct', 'covid_spread_chance_pct')})
+    
+    assert len(design) == 8 and len(design.drop_duplicates()) == 8
+    coded = pd.DataFrame({k: np.where(design[k] == low, -1, 1) for k, (low, high) in factors.items()})
+    for key, (low, high) in factors.items():
+        assert set(design[key]) == {low, high}
+    assert (coded['vaccination_pct'] == coded['precaution_pct'] * coded['covid_spread_chance_pct']).all()
+    assert design['avg_degree'].dtype.kind == 'i'
+
+
+def test_space_filling_designs_round_integer_keys():
+    ranges = {'avg_degree': (5, 50), 'precaution_pct': (0, 80), 'v_start_time': (0, 360)}
+    for design in (latin_hypercube(ranges, 10, seed=1), sobol(ranges, 16, seed=1)):
+        for key, (low, high) in ranges.items():
+            assert design[key].between(low, high).all()
+        assert design['avg_degree'].dtype.kind == 'i' and design['v_start_time'].dtype.kind == 'i'
+        assert design['precaution_pct'].dtype.kind == 'f'
+    
+    # One point in each of the n strata of every (continuous) key
+    design = latin_hypercube(ranges, 10, seed=1)
+    assert sorted((design['precaution_pct'] // 8).astype(int)) == list(range(10))
+
+
+def fake_run_batch(calls):
+    """run_batch stand-in: records batch sizes; even seeds take off"""
+    def run_batch(configs, seeds, screen_days=None, **kwargs):
+        calls.append(len(seeds))
+        results = []
+        for seed in seeds:
+            results.append({**{metric: seed for metric in METRIC_COLUMNS}, 'took_off': seed % 2 == 0})
+            if not screen_days:
+                del results[-1]['took_off']
+        return results
+    return run_batch
+
+
+def test_short_chunks_are_padded_to_a_power_of_two(monkeypatch):
+    calls = []
+    monkeypatch.setattr(designs, 'run_batch', fake_run_batch(calls))
+    
+    design = latin_hypercube({'avg_degree': (10, 50), 'vaccination_pct': (0, 80)}, 5, seed=0)
+    df = run_task_table(task_table(design, [1, 2]), chunk_size=8, use_result_cache=False)
+    assert calls == [2] * 5 and len(df) == 10
+    
+    calls.clear()
+    table = task_table(full_factorial({'vaccination_pct': [0, 10, 20, 30, 40]}), [1, 2, 3])
+    df = run_task_table(table, chunk_size=8, use_result_cache=False)
+    assert calls == [8, 8] and list(df['infected']) == list(table['seed'])
+
+
+def test_conditioned_on_takeoff_counts_extinctions(monkeypatch):
+    calls = []
+    monkeypatch.setattr(designs, 'run_batch', fake_run_batch(calls))
+    design = full_factorial({'vaccination_pct': [0, 50]})
+    
+    runs, extinction = run_conditioned_on_takeoff(design, n_takeoff=3, first_seed=1, max_attempts=40)
+    for point in (0, 1):
+        point_runs = runs[runs['design_point'] == point]
+        assert point_runs['took_off'].sum() >= 3
+        assert (point_runs['took_off'] == (point_runs['seed'] % 2 == 0)).all()
+    
+    expected = runs.groupby('design_point')['took_off'].agg(['size', 'sum'])
+    assert list(extinction['n_runs']) == list(expected['size'])
+    assert list(extinction['n_took_off']) == list(expected['sum'])
+    assert np.allclose(extinction['extinction_probability'], 1 - expected['sum'] / expected['size'])
+    assert list(extinction['vaccination_pct']) == [0, 50]
+
+
+def test_extinction_summary_ci():
+    runs = pd.DataFrame({'design_point': [0] * 4 + [1] * 2, 'vaccination_pct': [0] * 4 + [50] * 2,
+                         'seed': range(6), 'took_off': [True, False, False, False, True, True],
+                         **{metric: 0 for metric in METRIC_COLUMNS}})
+    summary = extinction_summary(runs)
+    assert list(summary['extinction_probability']) == [0.75, 0.0]
+    assert np.isclose(summary['extinction_ci95'][0], 1.96 * np.sqrt(0.75 * 0.25 / 4))
+    assert summary['extinction_ci95'][1] == 0
+
+
+def test_screened_runs_stop_early():
+    table = task_table(full_factorial({'initial_infected_agents': [1], 'covid_spread_chance_pct': [4]}),
+                       list(range(8)))
+    df = run_task_table(table, n_agents=1000, chunk_size=8, screen_days=10, takeoff_threshold=10)
+    screened_out = df[~df['took_off']]
+    
+    assert df['took_off'].dtype == bool and len(screened_out) > 0
+    assert (screened_out['runtime_days'] <= 10).all() and (screened_out['infected'] <= 10).all()
+    assert (df.loc[df['took_off'], 'infected'] > 10).all()
+    
+    # Screened-out rows hold their own run's results over the screening days
+    for _, row in screened_out.iterrows():
+        abm = FixedGPUABM()
+        abm.initialize_simulation(N=1000, seed=int(row['seed']), initial_infected_agents=1,
+                                  covid_spread_chance_pct=4, max_days=10, bucket='pow2')
+        results = abm.run_simulation(verbose=False, save_timeseries=False)
+        assert {metric: row[metric] for metric in METRIC_COLUMNS} == results
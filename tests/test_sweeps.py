@@ -0,0 +1,102 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sweeps import QuantileSketch, RunningStats, calculate_statistics
+
+
+def sweep_frame(seed=0, n_values=3, n_runs=12):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'param_name': 'vaccination_pct',
+        'param_value': np.repeat(np.arange(n_values) * 10.0, n_runs),
+        'infected': rng.integers(100, 1000, n_values * n_runs).astype(float),
+        'long_covid_cases': rng.integers(0, 100, n_values * n_runs).astype(float),
+    })
+
+
+def test_calculate_statistics_matches_numpy():
+    df = sweep_frame()
+    stats = calculate_statistics(df, percentiles=True)
+    for (_, row), (_, group) in zip(stats.iterrows(), df.groupby('param_value')):
+        for metric in ('infected', 'long_covid_cases'):
+            values = group[metric].to_numpy()
+            assert row[f'{metric}_n'] == len(values)
+            assert np.isclose(row[f'{metric}_mean'], values.mean())
+            assert np.isclose(row[f'{metric}_std'], values.std())
+            assert np.isclose(row[f'{metric}_ci95'], 1.96 * values.std() / np.sqrt(len(values)))
+            assert np.isclose(row[f'{metric}_p_lo'], np.quantile(values, 0.025))
+            assert np.isclose(row[f'{metric}_p_hi'], np.quantile(values, 0.975))
+        assert row['n_replications'] == len(group)
+
+
+def test_calculate_statistics_with_missing_values():
+    df = sweep_frame()
+    df.loc[[0, 5, 13], 'infected'] = np.nan
+    
+    stats = calculate_statistics(df, bootstrap=200, percentiles=True)
+    expected = calculate_statistics(df.dropna(subset=['infected']), metrics=['infected'],
+                                    bootstrap=200, percentiles=True)
+    complete = calculate_statistics(df, metrics=['long_covid_cases'], bootstrap=200, percentiles=True)
+    
+    assert list(stats['n_replications']) == [12, 12, 12]
+    assert list(stats['infected_n']) == [10, 11, 12]
+    for column in expected.columns.drop(['param_name', 'param_value', 'n_replications']):
+        assert np.allclose(stats[column], expected[column]), column
+    for column in complete.columns.drop(['param_name', 'param_value']):
+        assert np.allclose(stats[column], complete[column]), column
+
+
+def test_calculate_statistics_group_without_values():
+    df = sweep_frame()
+    df.loc[df['param_value'] == 10.0, 'infected'] = np.nan
+    stats = calculate_statistics(df, bootstrap=50, percentiles=True)
+    missing = stats[stats['param_value'] == 10.0].iloc[0]
+    assert missing['infected_n'] == 0
+    assert np.isnan(missing[['infected_mean', 'infected_boot_lo', 'infected_p_hi']].astype(float)).all()
+    assert not np.isnan(stats['long_covid_cases_boot_lo']).any()
+
+
+def test_running_stats_match_numpy_on_split_data():
+    df = sweep_frame(n_values=1, n_runs=300)
+    metrics = ['infected', 'long_covid_cases']
+    parts = [df.iloc[:7], df.iloc[7:120], df.iloc[120:121], df.iloc[121:]]
+    
+    merged = RunningStats(metrics)
+    resumed = RunningStats(metrics)
+    for part in parts:
+        stats = RunningStats(metrics)
+        for row in part.to_dict('records'):
+            stats.update(row)
+            resumed.update(row)
+        merged.merge(stats)
+        resumed = RunningStats.from_dict(json.loads(json.dumps(resumed.to_dict())))  # As saved between runs
+    
+    for stats in (merged, resumed):
+        assert stats.n == len(df)
+        for metric in metrics:
+            values = df[metric].to_numpy()
+            assert np.isclose(stats.mean[metric], values.mean())
+            assert np.isclose(stats.std(metric), values.std())
+            assert (stats.min[metric], stats.max[metric]) == (values.min(), values.max())
+            assert stats.sketch[metric].count == len(values)
+
+
+@pytest.mark.parametrize('accuracy', [0.01, 0.05])
+def test_sketch_quantiles_within_relative_accuracy(accuracy):
+    rng = np.random.default_rng(1)
+    values = np.concatenate([rng.lognormal(5, 2, 4000), -rng.lognormal(1, 1, 500), np.zeros(100)])
+    rng.shuffle(values)
+    
+    sketch, left, right = QuantileSketch(accuracy), QuantileSketch(accuracy), QuantileSketch(accuracy)
+    for i, x in enumerate(values):
+        sketch.add(x)
+        (left if i % 3 else right).add(x)
+    left.merge(right)
+    
+    for q in (0, 0.01, 0.05, 0.1, 0.12, 0.25, 0.5, 0.9, 0.95, 0.99, 1):
+        exact = np.quantile(values, q, method='lower')  # The sketch's rank rule
+        for s in (sketch, left):
+            assert abs(s.quantile(q) - exact) <= accuracy * abs(exact) + 1e-12, (q, s.quantile(q), exact)